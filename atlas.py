@@ -0,0 +1,91 @@
+import json
+import os
+
+import pygame
+
+# =============================
+# ATLAS (asset pre-cotti)
+# =============================
+# Formato scritto da bake_assets.py e letto da main.py:
+#   atlas.png  -> tutti gli sprite (gia' rifilati e scalati alla misura massima usata),
+#                 piu' opzionalmente i livelli LOD e i coni di luce
+#   bg.jpg     -> sfondo opaco gia' alla risoluzione di gioco (in JPEG pesa ~1/7 del PNG)
+#   atlas.json -> manifest con i rettangoli e la configurazione con cui e' stato cotto
+
+VERSION = 1
+MANIFEST = "atlas.json"
+ATLAS_W = 2048
+PAD = 1
+
+def shelf_pack(sizes, width=ATLAS_W, pad=PAD):
+    """Impacchetta per ripiani (dal piu' alto): ritorna (rects nello stesso ordine, altezza)."""
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    rects = [None] * len(sizes)
+    x = y = shelf_h = 0
+    for i in order:
+        w, h = sizes[i]
+        if w > width:
+            raise ValueError(f"sprite {w}x{h} piu' largo dell'atlas ({width})")
+        if x + w > width:
+            x, y = 0, y + shelf_h + pad
+            shelf_h = 0
+        rects[i] = (x, y, w, h)
+        x += w + pad
+        shelf_h = max(shelf_h, h)
+    return rects, y + shelf_h
+
+class AtlasWriter:
+    def __init__(self):
+        self._items = []   # (kind, key, surface)
+
+    def add(self, kind, key, surf):
+        self._items.append((kind, key, surf))
+
+    def write(self, out_dir, manifest, bg=None):
+        os.makedirs(out_dir, exist_ok=True)
+        rects, height = shelf_pack([s.get_size() for _, _, s in self._items])
+        sheet = pygame.Surface((ATLAS_W, max(1, height)), pygame.SRCALPHA)
+        sheet.fill((0, 0, 0, 0))
+
+        entries = {}
+        for (kind, key, surf), r in zip(self._items, rects):
+            sheet.blit(surf, r[:2])
+            entries.setdefault(kind, []).append([key, list(r)])
+
+        manifest = dict(manifest, version=VERSION, atlas="atlas.png", entries=entries)
+        pygame.image.save(sheet, os.path.join(out_dir, "atlas.png"))
+        if bg is not None:
+            pygame.image.save(bg, os.path.join(out_dir, "bg.jpg"))
+            manifest["bg"] = "bg.jpg"
+        with open(os.path.join(out_dir, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=1)
+        return manifest
+
+class Atlas:
+    def __init__(self, path, manifest, sheet):
+        self.path = path
+        self.manifest = manifest
+        self.sheet = sheet
+        self._entries = {kind: {_key(k): tuple(r) for k, r in items}
+                         for kind, items in manifest["entries"].items()}
+
+    def get(self, kind, key):
+        """Subsurface dell'atlas (condivide i pixel, nessuna copia)."""
+        return self.sheet.subsurface(self._entries[kind][_key(key)])
+
+    def items(self, kind):
+        for k, r in self._entries.get(kind, {}).items():
+            yield k, self.sheet.subsurface(r)
+
+def _key(k):
+    # le chiavi composte (es. livello LOD) arrivano dal JSON come liste
+    return tuple(k) if isinstance(k, list) else k
+
+def read_manifest(path):
+    """Manifest dell'atlas in `path`, oppure None se manca o e' di un'altra versione."""
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == VERSION else None
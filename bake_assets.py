@@ -0,0 +1,65 @@
+import argparse
+import os
+import sys
+import time
+
+# gira senza finestra e sempre dai PNG originali: il driver va scelto prima di importare pygame
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ["RIDERS_RAW_ASSETS"] = "1"
+
+import atlas  # noqa: E402
+import main as game  # noqa: E402
+
+game.LOADER.run()
+
+# =============================
+# BAKE ASSETS (offline)
+# =============================
+# python bake_assets.py                  -> assets/baked/{atlas.png, bg.jpg, atlas.json}
+# python bake_assets.py --lod            -> anche tutti i livelli LOD (download piu' grande, avvio piu' rapido)
+#
+# Ogni sprite finisce nell'atlas gia' rifilato e scalato alla misura massima che il
+# gioco usa (livello vicino), non a 1536x1024. I coni di luce per la risoluzione
+# di gioco sono inclusi: all'avvio non si disegna piu' nessun cono.
+
+def bake(out_dir, lod=False, cones=True):
+    sprites = game.SPRITES
+    w = atlas.AtlasWriter()
+    for name in game.SPRITE_FILES:
+        w.add("sprite", name, sprites.get(name, 1.0))
+
+    manifest = {
+        "view": list(game.screen.get_size()),
+        "src_size": {n: list(s) for n, s in game.SRC_SIZE.items()},
+    }
+    if lod:
+        top = {n: sprites.level_count(n) - 1 for n in game.SPRITE_FILES}
+        for name, lvl, flip, img in sprites.entries():
+            # il livello vicino non flippato e' gia' la base dello sprite
+            if lvl != top[name] or flip:
+                w.add("lod", [name, lvl, flip], img)
+        manifest["lod_levels"] = {n: sprites.level_count(n) for n in game.SPRITE_FILES}
+    if cones:
+        for (cw, ch), base in game.CONES.entries():
+            w.add("cone", [cw, ch], base)
+        manifest["cones"] = {"grid": game.CONES.grid, "layers": game.CONES.layers}
+
+    return w.write(out_dir, manifest, bg=game.BG_IMG)
+
+def main():
+    ap = argparse.ArgumentParser(description="Pre-cuoce sprite, coni e sfondo in un atlas per il gioco")
+    ap.add_argument("--out", default=game.BAKED_DIR)
+    ap.add_argument("--lod", action="store_true", help="include tutti i livelli LOD pre-scalati")
+    ap.add_argument("--no-cones", action="store_true", help="non include i coni di luce")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    manifest = bake(args.out, lod=args.lod, cones=not args.no_cones)
+    counts = {kind: len(items) for kind, items in manifest["entries"].items()}
+    total = sum(os.path.getsize(os.path.join(args.out, f)) for f in os.listdir(args.out))
+    print(f"{args.out}: {counts}, {total / 1e6:.2f} MB in {time.perf_counter() - t0:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+# gira senza finestra: il driver va scelto prima di importare pygame
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+import main as game  # noqa: E402
+import scene  # noqa: E402
+import sim  # noqa: E402
+
+game.LOADER.run()  # in gioco gli asset arrivano a pezzi, qui servono tutti subito
+
+# =============================
+# BENCHMARK (headless)
+# =============================
+# python bench.py --save bench.json
+# python bench.py --baseline bench.json          (exit 1 se qualcosa peggiora oltre --tolerance)
+#
+# Ogni voce e' il costo mediano per chiamata in microsecondi (piu' basso = meglio);
+# per i frame interi c'e' anche l'fps equivalente, per la simulazione i tick/s.
+
+SCENES = {"day": 0.0, "fade": 0.5, "night": 1.0}
+OBSTACLE_COUNTS = (10, 50, 200)
+T_MS = 12345  # istante fisso: scroll di lampioni e tratteggio riproducibile
+
+def scene_state(n_obstacles, seed=1, vectorized=False):
+    return scene.scene_state(n_obstacles, seed, player_w=game.player_width(), vectorized=vectorized)
+
+def timeit(fn, min_time, repeats):
+    """Mediana del costo per chiamata (us) su `repeats` giri da almeno min_time/repeats secondi."""
+    fn()  # warmup: riempie le cache come in gioco
+    n = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        el = time.perf_counter() - t0
+        if el >= min_time / repeats:
+            break
+        n *= 2
+    runs = [el / n]
+    for _ in range(repeats - 1):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        runs.append((time.perf_counter() - t0) / n)
+    return statistics.median(runs) * 1e6, n
+
+def render_benches():
+    screen = game.screen
+    p = scene_state(0)["player"]
+    cone_args = [(game.VIEW.cone_w[y], game.VIEW.cone_h[y], i)
+                 for y in range(game.VIEW.road_top, game.VIEW.bottom_y, 23) for i in (40, 110, 170)]
+
+    yield "draw_road", lambda: game.draw_road(screen, T_MS, 0.0)
+    for name, night in SCENES.items():
+        yield f"draw_lamps/{name}", lambda night=night: game.draw_lamps(screen, night, T_MS)
+    yield "soft_cone_light", lambda: [game.soft_cone_light(*a) for a in cone_args]
+
+    near, far = (sim.Thing("suv", random.Random(0)) for _ in range(2))
+    near.d, far.d = 0.05, 0.9
+    yield "draw_thing/near", lambda: game.draw_thing(screen, near.kind, near.var, near.d, near.lane_x)
+    yield "draw_thing/far", lambda: game.draw_thing(screen, far.kind, far.var, far.d, far.lane_x)
+
+    p_straight = scene_state(0)["player"]
+    p_straight.steer_vis = 0.0
+    yield "draw_player/straight", lambda: game.draw_player(screen, p_straight)
+    yield "draw_player/steering", lambda: game.draw_player(screen, p)
+
+    for layered in (False, True):
+        mode = "layered" if layered else "full"
+        for name, night in SCENES.items():
+            for n in (0,) + OBSTACLE_COUNTS:
+                state = scene_state(n)
+                yield (f"frame/{mode}/{name}/{n}",
+                       lambda state=state, night=night, layered=layered: game.draw_frame(state, night, T_MS, layered))
+
+    # stessa scena notturna a ogni livello del controller di qualita'
+    state = scene_state(50)
+    for tier in game.QUALITY.tiers:
+        yield (f"frame/quality/{tier['name']}",
+               lambda name=tier["name"]: (game.QUALITY.pin(name), game.apply_quality(),
+                                          game.draw_frame(state, 1.0, T_MS)))
+    game.QUALITY.pin(None)
+    game.QUALITY.tier = 0
+    game.apply_quality()
+    game.LOADER.run()
+
+def sim_benches():
+    def policy(state):
+        k = state["tick"]
+        return sim.Inputs(1.0 if (k // 40) % 2 else -1.0, k % 90 == 0, False)
+
+    def run_sessions(vectorized):
+        ticks = 0
+        t0 = time.perf_counter()
+        for seed in range(20):
+            ticks += sim.simulate(seed, policy, vectorized=vectorized)["tick"]
+        return ticks, time.perf_counter() - t0
+
+    for vectorized in (False, True):
+        tag = "numpy" if vectorized else "list"
+        yield f"sim/sessions/{tag}", lambda v=vectorized: run_sessions(v)
+        for n in OBSTACLE_COUNTS:
+            yield f"sim/tick/{tag}/{n}", lambda n=n, v=vectorized: dense_ticks(n, v)
+
+def dense_ticks(n, vectorized, ticks=30, repeats=20):
+    """Tick con n ostacoli in pista: stato nuovo a ogni giro (non cronometrato), ritorna i tick fatti."""
+    el = 0.0
+    for r in range(repeats):
+        state = scene_state(n, seed=r, vectorized=vectorized)
+        state["player"].air = 1e9  # sempre in volo: niente game over
+        state["player"].on_ground = False
+        t0 = time.perf_counter()
+        for _ in range(ticks):
+            sim.step(state, sim.DT, sim.NO_INPUT)
+        el += time.perf_counter() - t0
+    return ticks * repeats, el
+
+def run(filter_, min_time, repeats):
+    results = {}
+    for name, fn in render_benches():
+        if filter_ and filter_ not in name:
+            continue
+        us, n = timeit(fn, min_time, repeats)
+        results[name] = {"us": us, "calls": n}
+        if name.startswith("frame/"):
+            results[name]["fps"] = 1e6 / us
+        print(f"{name:32s} {us:10.1f} us" + (f"  {1e6 / us:7.1f} fps" if name.startswith("frame/") else ""))
+
+    for name, fn in sim_benches():
+        if filter_ and filter_ not in name:
+            continue
+        ticks, el = fn()
+        us = el / ticks * 1e6
+        results[name] = {"us": us, "ticks_per_s": 1e6 / us}
+        print(f"{name:32s} {us:10.2f} us  {1e6 / us:9.0f} tick/s")
+    return results
+
+def compare(results, baseline, tolerance):
+    """Ritorna le voci piu' lente della baseline oltre la tolleranza."""
+    worse = []
+    print(f"\n{'bench':32s} {'base us':>10s} {'now us':>10s} {'delta':>8s}")
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b:
+            continue
+        delta = r["us"] / b["us"] - 1.0
+        flag = ""
+        if delta > tolerance:
+            worse.append(name)
+            flag = "  <-- REGRESSION"
+        print(f"{name:32s} {b['us']:10.1f} {r['us']:10.1f} {delta:+7.1%}{flag}")
+    return worse
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark headless di rendering e simulazione")
+    ap.add_argument("--save", help="scrive i risultati in JSON")
+    ap.add_argument("--baseline", help="JSON salvato con --save da confrontare")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="peggioramento ammesso (0.15 = 15%%)")
+    ap.add_argument("--filter", default="", help="solo i bench che contengono questa stringa")
+    ap.add_argument("--quick", action="store_true", help="meno tempo per voce, piu' rumore")
+    args = ap.parse_args()
+
+    min_time, repeats = (0.1, 3) if args.quick else (0.5, 5)
+    results = run(args.filter, min_time, repeats)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "sdl": ".".join(map(str, pygame.get_sdl_version())),
+            "platform": platform.platform(),
+            "driver": pygame.display.get_driver(),
+            "size": list(game.screen.get_size()),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+        "assets": game.LOADER.report(),
+        "caches": {"sprites": game.SPRITES.stats(), "cones": game.CONES.stats(), "text": game.TEXT.stats(),
+                   "player_rot": game.PLAYER_ROT.stats()},
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        worse = compare(results, baseline, args.tolerance)
+        if worse:
+            print(f"\n{len(worse)} regressioni oltre {args.tolerance:.0%}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import time
+from collections import deque, namedtuple
+
+import pygame
+
+# =============================
+# CONTROLS (input a eventi)
+# =============================
+# Lo stato dei puntatori (mouse e dita) e dei tasti cambia solo quando arriva un
+# evento: ogni puntatore tiene le zone in cui si trova come bit, e per ogni zona
+# c'e' il numero di puntatori dentro. Il frame chiede snapshot(), che e' solo
+# qualche lookup, invece di rifare i collidepoint di tutti i puntatori.
+#
+# Latenza: si prende l'istante in cui il loop legge il primo input nuovo, lo si
+# passa al primo tick di simulazione che lo usa e si chiude la misura dopo il
+# present di quel frame. pygame non espone il timestamp SDL degli eventi, quindi
+# l'attesa in coda prima della lettura (al massimo un frame) resta fuori.
+
+LEFT, RIGHT, JUMP, RESTART = 1, 2, 4, 8
+
+# tutto il resto (finestra, joystick, audio, testo...) non entra nemmeno in coda
+EVENTS = (
+    pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP,
+    pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION,
+    pygame.FINGERDOWN, pygame.FINGERMOTION, pygame.FINGERUP,
+)
+
+STEER_KEYS = {pygame.K_a: -1, pygame.K_LEFT: -1, pygame.K_d: 1, pygame.K_RIGHT: 1}
+MOUSE = "mouse"
+LATENCY_WINDOW = 240
+
+Snapshot = namedtuple("Snapshot", "steer jump restart jump_held restart_held")
+
+def allow_events():
+    """Prima di set_mode: set_blocked butta anche gli eventi gia' in coda."""
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(EVENTS)
+
+class Controls:
+    def __init__(self, to_render, display_size):
+        """to_render(x, y): pixel della finestra -> pixel del render target, dove stanno le zone."""
+        self.to_render = to_render
+        self.display_size = display_size
+        self.zones = ()
+        self._pointers = {}                  # id -> [x, y (finestra), bit delle zone]
+        self._inside = {LEFT: 0, RIGHT: 0, JUMP: 0, RESTART: 0}
+        self._keys = set()                   # tasti di sterzo premuti
+        self.jump_pending = False            # tasti premuti tra due tick fissi: non vanno persi
+        self.restart_pending = False
+
+        self._t_input = None                 # primo input non ancora passato alla simulazione
+        self._t_applied = None               # ... gia' simulato, in attesa del present
+        self.frame_latency = None            # ms, solo nei frame che mostrano un input nuovo
+        self.latency = deque(maxlen=LATENCY_WINDOW)
+
+    def set_zones(self, left, right, jump, restart):
+        """Rect nel render target (il layout cambia con la risoluzione)."""
+        self.zones = ((LEFT, left), (RIGHT, right), (JUMP, jump), (RESTART, restart))
+        for pid, p in list(self._pointers.items()):
+            self._move(pid, p[0], p[1])
+
+    def sync_keys(self):
+        """All'inizio della partita: un tasto di sterzo gia' premuto non ha piu' il suo KEYDOWN."""
+        pressed = pygame.key.get_pressed()
+        self._keys = {k for k in STEER_KEYS if pressed[k]}
+
+    # ---- eventi ----
+    def handle(self, event, over):
+        """Aggiorna lo stato; False se l'evento non e' di input di gioco (F2, F3, QUIT...)."""
+        t = event.type
+        if t == pygame.MOUSEBUTTONDOWN:
+            self._move(MOUSE, *event.pos)
+        elif t == pygame.MOUSEMOTION:
+            if MOUSE in self._pointers:
+                self._move(MOUSE, *event.pos)
+        elif t == pygame.MOUSEBUTTONUP:
+            self._lift(MOUSE)
+        elif t in (pygame.FINGERDOWN, pygame.FINGERMOTION):
+            fid = getattr(event, "finger_id", 0)
+            if t == pygame.FINGERDOWN or fid in self._pointers:
+                w, h = self.display_size
+                self._move(fid, int(event.x * w), int(event.y * h))
+        elif t == pygame.FINGERUP:
+            self._lift(getattr(event, "finger_id", 0))
+        elif t == pygame.KEYDOWN:
+            if event.key in STEER_KEYS:
+                self._keys.add(event.key)
+            elif event.key == pygame.K_SPACE and not over:
+                self.jump_pending = True
+            elif event.key == pygame.K_r and over:
+                self.restart_pending = True
+            else:
+                return False
+            self._touch()
+        elif t == pygame.KEYUP:
+            if event.key not in self._keys:
+                return False
+            self._keys.discard(event.key)
+            self._touch()
+        else:
+            return False
+        return True
+
+    def _bits(self, x, y):
+        rx, ry = self.to_render(x, y)
+        bits = 0
+        for bit, rect in self.zones:
+            if rect.collidepoint(rx, ry):
+                bits |= bit
+        return bits
+
+    def _move(self, pid, x, y):
+        p = self._pointers.get(pid)
+        old = p[2] if p else 0
+        bits = self._bits(x, y)
+        self._pointers[pid] = [x, y, bits]
+        if bits != old:
+            self._count(old, -1)
+            self._count(bits, 1)
+            self._touch()
+
+    def _lift(self, pid):
+        p = self._pointers.pop(pid, None)
+        if p and p[2]:
+            self._count(p[2], -1)
+            self._touch()
+
+    def _count(self, bits, k):
+        for bit in self._inside:
+            if bits & bit:
+                self._inside[bit] += k
+
+    def _touch(self):
+        if self._t_input is None:
+            self._t_input = time.perf_counter()
+
+    # ---- per frame ----
+    def snapshot(self, over):
+        inside = self._inside
+        steer = 0.0
+        if any(STEER_KEYS[k] < 0 for k in self._keys):
+            steer -= 1.0
+        if any(STEER_KEYS[k] > 0 for k in self._keys):
+            steer += 1.0
+        if inside[LEFT] and not inside[RIGHT]:
+            steer = -1.0
+        elif inside[RIGHT] and not inside[LEFT]:
+            steer = 1.0
+        jump_held = inside[JUMP] > 0
+        restart_held = over and inside[RESTART] > 0
+        return Snapshot(steer, self.jump_pending or jump_held, self.restart_pending or restart_held,
+                        jump_held, restart_held)
+
+    def consume(self):
+        """Dopo un tick di simulazione: i tasti in attesa sono stati usati."""
+        self.jump_pending = self.restart_pending = False
+        if self._t_input is not None:
+            if self._t_applied is None:
+                self._t_applied = self._t_input
+            self._t_input = None
+
+    def presented(self):
+        """Dopo il present: chiude la misura di latenza dell'input appena mostrato."""
+        self.frame_latency = None
+        if self._t_applied is not None:
+            self.frame_latency = (time.perf_counter() - self._t_applied) * 1000.0
+            self.latency.append(self.frame_latency)
+            self._t_applied = None
+        return self.frame_latency
+
+    def stats(self):
+        vals = sorted(self.latency)
+        if not vals:
+            return {"samples": 0}
+        return {"samples": len(vals), "p50_ms": vals[len(vals) // 2],
+                "p95_ms": vals[min(len(vals) - 1, int(len(vals) * 0.95))], "max_ms": vals[-1]}
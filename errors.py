@@ -0,0 +1,147 @@
+import json
+import os
+import sys
+import time
+import traceback
+from collections import deque
+
+import pygame
+
+# =============================
+# ERRORI (ring buffer + stage protetti)
+# =============================
+# Ogni stage del frame gira dentro guard(): se solleva, l'eccezione finisce nel
+# ring buffer con stage, numero di frame e tempi, lo stage salta il frame
+# successivo e poi si riprova. Il resto del frame va avanti, quindi un errore
+# isolato costa al massimo un paio di frame e non blocca la partita.
+# Errori uguali di fila (stesso stage, tipo e riga) diventano una voce con count.
+#
+# L'overlay si disegna una volta quando cambia il buffer e poi e' un solo blit.
+# F4 lo tiene aperto, F5 esporta il buffer in JSON (su web in localStorage).
+
+CAPACITY = 64
+SHOW_S = 4.0             # overlay visibile per questi secondi dopo l'ultimo errore
+REFRESH_FRAMES = 30      # i contatori dell'overlay si aggiornano al massimo ogni tanto
+MAX_LINES = 8
+STORAGE_KEY = "riders.errors"
+EXPORT_FILE = "riders-errors.json"
+
+def _where(exc):
+    tb = traceback.extract_tb(exc.__traceback__)
+    if not tb:
+        return "?"
+    f = tb[-1]
+    return f"{os.path.basename(f.filename)}:{f.lineno} {f.name}"
+
+class ErrorLog:
+    def __init__(self, capacity=CAPACITY, clock=None):
+        """clock() -> ms di gioco da salvare nelle voci (opzionale)."""
+        self.entries = deque(maxlen=capacity)
+        self.clock = clock
+        self.total = 0
+        self.frame = 0
+        self.version = 0             # cambia a ogni voce nuova
+        self.show = False
+        self._t0 = time.perf_counter()
+        self._frame_t = self._t0
+        self._last_t = None
+        self._skip = {}              # stage -> frame da saltare
+        self._surf = None
+        self._surf_key = None
+        self._surf_frame = 0
+        self._surf_total = 0
+
+    def begin_frame(self):
+        self.frame += 1
+        self._frame_t = time.perf_counter()
+
+    def skip(self, stage):
+        return self._skip.get(stage) == self.frame
+
+    def guard(self, stage, fn, *args):
+        """fn(*args) protetto; None se lo stage e' saltato o ha sollevato."""
+        if self._skip.get(stage) == self.frame:
+            return None
+        try:
+            return fn(*args)
+        except Exception as e:
+            self.record(stage, e)
+            return None
+
+    def record(self, stage, exc):
+        now = time.perf_counter()
+        self.total += 1
+        self._last_t = now
+        self._skip[stage] = self.frame + 1
+        where = _where(exc)
+        last = self.entries[-1] if self.entries else None
+        if last and (last["stage"], last["type"], last["where"]) == (stage, type(exc).__name__, where):
+            last["count"] += 1
+            last["last_frame"] = self.frame
+            return last
+        entry = {
+            "stage": stage,
+            "frame": self.frame,
+            "last_frame": self.frame,
+            "count": 1,
+            "type": type(exc).__name__,
+            "message": str(exc),
+            "where": where,
+            "time_s": round(now - self._t0, 3),
+            "frame_ms": round((now - self._frame_t) * 1000.0, 3),  # a che punto del frame
+            "game_ms": self.clock() if self.clock else None,
+            "traceback": "".join(traceback.format_exception(type(exc), exc, exc.__traceback__)),
+        }
+        self.entries.append(entry)
+        self.version += 1
+        print(f"errore nello stage {stage} (frame {self.frame}):\n{entry['traceback']}", file=sys.stderr)
+        return entry
+
+    # ---- overlay ----
+    def visible(self):
+        if not self.entries:
+            return False
+        return self.show or time.perf_counter() - self._last_t < SHOW_S
+
+    def overlay(self, font, width):
+        """Surface pronta da blittare; si rifa' solo per voci nuove (o contatori, ogni tanto)."""
+        key = (self.version, width, id(font))
+        if self._surf is not None and self._surf_key == key:
+            # stesse voci: i contatori si rinfrescano al massimo ogni REFRESH_FRAMES
+            if self._surf_total == self.total or self.frame - self._surf_frame < REFRESH_FRAMES:
+                return self._surf
+
+        lines = [(f"ERRORI: {self.total} (F4 lista, F5 esporta)", (255, 120, 120))]
+        for e in list(self.entries)[-MAX_LINES:]:
+            n = f" x{e['count']}" if e["count"] > 1 else ""
+            lines.append((f"#{e['frame']} {e['stage']}{n}: {e['type']}: {e['message']}"[:110], (255, 255, 255)))
+            lines.append((f"    {e['where']}", (170, 170, 170)))
+        imgs = [font.render(txt, True, color) for txt, color in lines]
+        pad = 8
+        h = sum(i.get_height() for i in imgs) + pad * 2
+        surf = pygame.Surface((width, h), pygame.SRCALPHA)
+        surf.fill((0, 0, 0, 190))
+        y = pad
+        for img in imgs:
+            surf.blit(img, (pad, y))
+            y += img.get_height()
+
+        self._surf, self._surf_key = surf, key
+        self._surf_frame = self.frame
+        self._surf_total = self.total
+        return surf
+
+    # ---- export ----
+    def to_json(self):
+        return json.dumps({"frames": self.frame, "total": self.total, "errors": list(self.entries)}, indent=1)
+
+    def export(self, path=EXPORT_FILE):
+        """Su web in localStorage (STORAGE_KEY), altrove su file; ritorna dove e' finito."""
+        data = self.to_json()
+        if sys.platform == "emscripten":
+            import platform
+            platform.window.localStorage.setItem(STORAGE_KEY, data)
+            return f"localStorage[{STORAGE_KEY}]"
+        with open(path, "w") as f:
+            f.write(data)
+        return path
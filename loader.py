@@ -0,0 +1,101 @@
+import io
+import time
+from collections import deque
+
+import pygame
+
+# =============================
+# ASSET LOADER (progressivo)
+# =============================
+# Ogni asset e' un generatore che fa un pezzo di lavoro alla volta e cede il
+# controllo con `yield "fase"`: il loop di main() chiama step() a ogni tick con
+# un budget in ms, quindi la schermata iniziale resta viva mentre si carica.
+# Il tempo di ogni pezzo va alla fase che il generatore ha appena dichiarato
+# (read, decode, scale, ...), per asset.
+
+class AssetLoader:
+    def __init__(self):
+        self._jobs = deque()     # (nome, generatore)
+        self.total = 0
+        self.done = 0
+        self.timings = {}        # asset -> {fase: ms}
+        self.sizes = {}          # asset -> byte letti da disco
+        self.errors = {}         # asset -> messaggio (resta il placeholder)
+        self._t0 = None
+        self.elapsed_ms = 0.0
+
+    def add(self, name, job):
+        self._jobs.append((name, job))
+        self.total += 1
+
+    @property
+    def finished(self):
+        return not self._jobs
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 1.0
+
+    def step(self, budget_ms=8.0):
+        """Avanza finche' dura il budget (sempre almeno un pezzo); True quando ha finito tutto."""
+        if not self._jobs:
+            return True
+        now = time.perf_counter()
+        if self._t0 is None:
+            self._t0 = now
+        deadline = now + budget_ms / 1000.0
+        while self._jobs:
+            name, job = self._jobs[0]
+            t0 = time.perf_counter()
+            try:
+                phase = next(job)
+            except StopIteration:
+                phase = None
+                self._finish()
+            except Exception as e:
+                phase = None
+                self.errors[name] = f"{type(e).__name__}: {e}"
+                self._finish()
+            t1 = time.perf_counter()
+            if phase:
+                ph = self.timings.setdefault(name, {})
+                ph[phase] = ph.get(phase, 0.0) + (t1 - t0) * 1000.0
+            if t1 >= deadline:
+                break
+        self.elapsed_ms = (time.perf_counter() - self._t0) * 1000.0
+        return not self._jobs
+
+    def _finish(self):
+        self._jobs.popleft()
+        self.done += 1
+
+    def run(self):
+        """Tutto subito, senza cedere il controllo (bench, bake, tool headless)."""
+        while not self.step(1e9):
+            pass
+
+    def read(self, name, path):
+        """Byte del file (contati in self.sizes); la decodifica e' a parte con decode()."""
+        with open(path, "rb") as f:
+            data = f.read()
+        self.sizes[name] = self.sizes.get(name, 0) + len(data)
+        return data
+
+    def report(self):
+        out = {}
+        for name, phases in self.timings.items():
+            out[name] = dict(phases, total=sum(phases.values()), bytes=self.sizes.get(name, 0))
+        for name, err in self.errors.items():
+            out.setdefault(name, {})["error"] = err
+        return out
+
+    def lines(self):
+        yield f"assets: {self.done}/{self.total} in {self.elapsed_ms:.0f} ms"
+        for name, r in self.report().items():
+            phases = "  ".join(f"{k} {v:.1f}" for k, v in r.items() if k not in ("total", "bytes", "error"))
+            err = f"  ERRORE {r['error']}" if "error" in r else ""
+            yield f"  {name:<8} {r.get('total', 0.0):7.1f} ms  {r.get('bytes', 0) / 1e6:5.2f} MB  {phases}{err}"
+
+def decode(data, namehint, alpha=True):
+    img = pygame.image.load(io.BytesIO(data), namehint)
+    return img.convert_alpha() if alpha else img.convert()
@@ -1,36 +1,80 @@
 import os
-import random
 import pygame
 import asyncio
-import traceback
 import math
+import time
+
+import atlas
+import replay
+import scene
+import sim
+from sim import WIDTH, HEIGHT, Inputs, clamp, lerp
+from perspective import Perspective
+from profiler import GRAPH_W, FrameProfiler
+from quality import QualityController
+from controls import Controls, allow_events
+from errors import ErrorLog
+from render import LayeredRenderer, display_flip
+from sprites import ConeAtlas, RotationFrames, SpriteCache
+from loader import AssetLoader, decode
+from text import TextCache
 
 # =============================
 # CONFIG
 # =============================
-WIDTH, HEIGHT = 900, 600
+# geometria strada, spawn e salti stanno in sim.py
 FPS = 60
+MAX_STEPS_PER_FRAME = 5  # evita la spirale quando un frame dura troppo
+VECTOR_OBSTACLES = False  # True: ostacoli in obstacles_np (numpy), utile con centinaia di ostacoli
+LAYERED_RENDER = True     # False: vecchio percorso full-redraw (F2 per confrontare in gioco)
+DIRTY_RECTS = True        # solo con LAYERED_RENDER, dove il backend lo supporta
 
-# Strada (versione buona)
-HORIZON_Y = int(HEIGHT * 0.52)
-BOTTOM_Y  = int(HEIGHT * 0.985)
+# ms per frame dedicati al caricamento asset: tanti sulla schermata iniziale, pochi in gioco
+LOAD_BUDGET_MS_START = 12.0
+LOAD_BUDGET_MS_GAME = 4.0
 
-ROAD_NEAR_W = int(WIDTH * 1.32)
-ROAD_FAR_W  = int(WIDTH * 0.14)
+# se impostata, la sessione viene salvata come replay (.rpl) a ogni game over e all'uscita
+REPLAY_DIR = os.environ.get("RIDERS_REPLAY_DIR")
 
-SPAWN_MS = 520
-RAMP_CHANCE = 0.25
+# profiler per stage: "1" lo accende con l'overlay (F3 in gioco), un path .csv/.json
+# lo accende e ci scrive la traccia all'uscita
+PROFILE = os.environ.get("RIDERS_PROFILE", "")
 
 SPRITE_ROT_DEG = 0
 
+# risoluzione: finestra e render interno sono indipendenti. Si disegna su una Surface
+# a RENDER_SIZE e la si presenta con un solo blit scalato (letterbox se le proporzioni
+# non coincidono); la simulazione resta nella geometria logica WIDTH x HEIGHT di sim.py.
+# RIDERS_DISPLAY=1280x720 (finestra), RIDERS_RENDER=640x400 (vuota = come la finestra)
+def _env_size(name, default):
+    v = os.environ.get(name)
+    if not v:
+        return default
+    w, h = v.lower().split("x")
+    return int(w), int(h)
+
+DISPLAY_SIZE = _env_size("RIDERS_DISPLAY", (WIDTH, HEIGHT))
+RENDER_SIZE = _env_size("RIDERS_RENDER", DISPLAY_SIZE)
+PRESENT_SMOOTH = False  # smoothscale in presentazione: piu' morbido, costa ~3 volte tanto
+
+# qualita' adattiva (quality.py): cala lampioni/coni quando i frame sforano il budget;
+# RIDERS_QUALITY=high|medium|low|lowest la fissa (catture di performance ripetibili)
+ADAPTIVE_QUALITY = True
+QUALITY_PIN = os.environ.get("RIDERS_QUALITY")
+
+# inclinazione del player in sterzata: frame pre-ruotati ogni PLAYER_ROT_STEP_DEG
+# (a 0.5 gradi i 49 frame pesano ~27 MB, a 1 grado ~14 MB)
+PLAYER_LEAN_DEG = 12.0
+PLAYER_ROT_STEP_DEG = 1.0
+
+# scena scriptata (scene.py): preset o script JSON che fissa tempo, notte, ostacoli e
+# qualita' a frame precisi, per catture ripetibili (con RIDERS_PROFILE=trace.json)
+SCENE = os.environ.get("RIDERS_SCENE")
+
 # Giorno / Notte
 DAY_NIGHT_PERIOD_S = 60.0
 DAY_NIGHT_FADE_S   = 3.0
 
-# Salti
-MANUAL_JUMP_MULT = 2.4   # <-- prima 1.0 (pulsante/spazio). Ora >=2x
-RAMP_JUMP_MULT   = 2.2   # salto su rampa (lasciato simile)
-
 # =============================
 # INIT
 # =============================
@@ -40,31 +84,105 @@ try:
 except Exception:
     pass
 
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
+allow_events()  # prima della finestra: il filtro non deve svuotare una coda gia' piena
+display = pygame.display.set_mode(DISPLAY_SIZE)
 pygame.display.set_caption("Riders - NYC")
 clock = pygame.time.Clock()
 
-font = pygame.font.SysFont(None, 24)
-big_font = pygame.font.SysFont(None, 56)
+# geometria della strada per la risoluzione di rendering (tabelle per riga)
+VIEW = Perspective(WIDTH, HEIGHT)
+
+def _target(size):
+    """Render target, scala e font per la risoluzione interna `size` (vedi set_render_size)."""
+    global screen, RENDER_K, PRESENT_RECT, _present_dst, font, big_font
+    w, h = size
+    RENDER_K = min(w / WIDTH, h / HEIGHT)  # pixel di render per pixel logico
+    screen = display if size == display.get_size() else pygame.Surface(size).convert()
+
+    dw, dh = display.get_size()
+    s = min(dw / w, dh / h)
+    PRESENT_RECT = pygame.Rect(0, 0, int(w * s), int(h * s))
+    PRESENT_RECT.center = (dw // 2, dh // 2)
+    _present_dst = display.subsurface(PRESENT_RECT)
+    display.fill((0, 0, 0))
+
+    VIEW.resize(w, h, RENDER_K)
+    font = pygame.font.SysFont(None, px(24))
+    big_font = pygame.font.SysFont(None, px(56))
+
+def px(v):
+    """Misura in pixel logici -> pixel del render target."""
+    return max(1, int(v * RENDER_K))
+
+def present(rects=None):
+    # render alla risoluzione della finestra: flip (o update dei soli rect);
+    # altrimenti un solo blit scalato dentro il rettangolo di letterbox
+    if screen is display:
+        display_flip(rects)
+        return
+    if PRESENT_SMOOTH:
+        pygame.transform.smoothscale(screen, PRESENT_RECT.size, _present_dst)
+    else:
+        pygame.transform.scale(screen, PRESENT_RECT.size, _present_dst)
+    pygame.display.flip()
+
+def to_render(x, y):
+    """Pixel della finestra -> pixel del render target (le zone touch sono nel render)."""
+    r = PRESENT_RECT
+    return (x - r.x) * screen.get_width() // r.w, (y - r.y) * screen.get_height() // r.h
+
+_target(RENDER_SIZE)
 
-APP_START_MS = pygame.time.get_ticks()
+# tempo di gioco in ms (0 all'avvio): lo leggono ciclo giorno/notte, scroll e simulazione
+CLOCK = scene.GameClock()
 
-def clamp(x, a, b): return max(a, min(b, x))
-def lerp(a, b, t): return a + (b - a) * t
+TEXT = TextCache()
 
 def draw_text(surf, txt, x, y, color=(255, 255, 255), center=False, fnt=None):
     fnt = fnt or font
-    img = fnt.render(txt, True, color)
+    img = TEXT.render(fnt, txt, color)
     r = img.get_rect()
     if center:
         r.center = (x, y)
     else:
         r.topleft = (x, y)
     surf.blit(img, r)
+    return r
+
+def draw_score(surf, label, score, x, y, color):
+    # etichetta fissa dalla cache + cifre da glifi: niente font.render quando cambia il numero
+    r = draw_text(surf, label, x, y, color=color)
+    TEXT.draw_number(surf, score, r.right, y, color, font)
+
+# =============================
+# BUTTONS / SCRATCH (pre-cotti)
+# =============================
+_button_cache = {}
+_scratch = {}
+
+def scratch(key, size, flags=0):
+    """Surface riusata tra i frame (overlay ecc.): creata una volta per (key, size, flags)."""
+    k = (key, size, flags)
+    s = _scratch.get(k)
+    if s is None:
+        s = _scratch[k] = pygame.Surface(size, flags)
+    return s
+
+def button_img(radius, active):
+    key = (radius, active)
+    btn = _button_cache.get(key)
+    if btn is None:
+        btn = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+        pygame.draw.circle(btn, (0, 0, 0, 120 if not active else 170), (radius, radius), radius)
+        pygame.draw.circle(btn, (255, 255, 255, 180), (radius, radius), radius - 4, width=4)
+        _button_cache[key] = btn
+    return btn
 
 # =============================
 # ASSETS
 # =============================
+# Le immagini si caricano a pezzi dentro il loop di main() (vedi ASSET LOADING):
+# fino ad allora si disegnano i rettangoli colorati di fallback.
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")
 
 def trim_alpha(img):
@@ -74,46 +192,140 @@ def trim_alpha(img):
     except:
         return img
 
-def load_png(name, fallback, color, trim=False):
-    try:
-        img = pygame.image.load(os.path.join(ASSETS_DIR, name)).convert_alpha()
-        return trim_alpha(img) if trim else img
-    except:
-        s = pygame.Surface(fallback, pygame.SRCALPHA)
-        pygame.draw.rect(s, color, s.get_rect(), border_radius=12)
-        return s
+def png_fallback(size, color):
+    s = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.rect(s, color, s.get_rect(), border_radius=12)
+    return s
 
-def load_bg(name):
+def png_width(path):
+    """Larghezza dall'header IHDR, senza decodificare; None se non e' un PNG leggibile."""
     try:
-        img = pygame.image.load(os.path.join(ASSETS_DIR, name)).convert()
-        return pygame.transform.smoothscale(img, (WIDTH, HEIGHT))
-    except:
-        bg = pygame.Surface((WIDTH, HEIGHT))
-        bg.fill((30, 30, 30))
-        return bg
+        with open(path, "rb") as f:
+            head = f.read(24)
+    except OSError:
+        return None
+    if head[:8] != b"\x89PNG\r\n\x1a\n" or head[12:16] != b"IHDR":
+        return None
+    return int.from_bytes(head[16:20], "big")
+
+def bg_fallback():
+    bg = pygame.Surface(screen.get_size())
+    bg.fill((30, 30, 30))
+    return bg
+
+# sprite: nome -> (file, fallback, colore, trim); l'ordine e' quello di caricamento
+SPRITE_FILES = {
+    "player": ("car_player.png", (260, 220), (220, 40, 40), False),
+    "suv1":   ("suv_black_1.png", (260, 220), (40, 40, 40), False),
+    "suv2":   ("suv_green.png", (260, 220), (40, 120, 60), False),
+    "ramp":   ("ramp_blue.png", (280, 200), (70, 130, 255), False),
+    "lamp":   ("lamppost_L.png", (512, 512), (90, 90, 95), True),
+}
+BG_FILE = "nyc_bg.png"
+
+# atlas pre-cotto da bake_assets.py (sprite gia' scalati, coni, sfondo in JPEG);
+# RIDERS_RAW_ASSETS=1 forza i PNG originali (lo usa bake_assets.py per rigenerarlo).
+# Qui si legge solo il manifest, l'immagine la decodifica il loader.
+BAKED_DIR = os.path.join(ASSETS_DIR, "baked")
+BAKED_MANIFEST = None if os.environ.get("RIDERS_RAW_ASSETS") else atlas.read_manifest(BAKED_DIR)
+def _baked_usable(m):
+    # sprite e sfondo dell'atlas sono gia' ridotti per la vista del bake: con un render
+    # target piu' grande andrebbero ingranditi (sfocati), meglio i PNG originali
+    if m is None or not all(n in m.get("src_size", {}) for n in SPRITE_FILES):
+        return False
+    vw, vh = m.get("view", (WIDTH, HEIGHT))
+    return RENDER_K <= min(vw / WIDTH, vh / HEIGHT) + 1e-6
+
+if not _baked_usable(BAKED_MANIFEST):
+    BAKED_MANIFEST = None
+BAKED = None  # atlas.Atlas quando il loader l'ha decodificato
+
+IMAGES = {n: png_fallback(fb, color) for n, (_, fb, color, _) in SPRITE_FILES.items()}
+SRC_SIZE = {n: img.get_size() for n, img in IMAGES.items()}
+BG_IMG = BG_SRC = bg_fallback()  # BG_SRC: sfondo alla risoluzione del file, per riscalarlo
 
-PLAYER_IMG = load_png("car_player.png", (260, 220), (220, 40, 40))
-SUV1_IMG   = load_png("suv_black_1.png", (260, 220), (40, 40, 40))
-SUV2_IMG   = load_png("suv_green.png", (260, 220), (40, 120, 60))
-RAMP_IMG   = load_png("ramp_blue.png", (280, 200), (70, 130, 255))
-LAMP_IMG   = load_png("lamppost_L.png", (512, 512), (90, 90, 95), trim=True)
-BG_IMG     = load_bg("nyc_bg.png")
+# =============================
+# SPRITE LOD
+# =============================
+def _sized(name, k, min_px):
+    w, h = SRC_SIZE[name]
+    w, h = w * RENDER_K, h * RENDER_K
+    return lambda t: (max(min_px, int(w * k(t))), max(min_px, int(h * k(t))))
+
+def _car_scale(t):
+    return 0.22 * lerp(0.18, 1.0, t)
+
+# nome -> (scala in funzione di t, lato minimo, opzioni per SpriteCache.register)
+SPRITE_LOD = {
+    "player": (lambda t: 0.27, 1, {"levels": 1}),
+    "suv1":   (_car_scale, 10, {}),
+    "suv2":   (_car_scale, 10, {}),
+    "ramp":   (_car_scale, 10, {}),
+    # lampioni: t e' la posizione sullo schermo (orizzonte -> fondo), scala su t ** 0.60
+    "lamp":   (lambda t: lerp(0.10, 0.42, t ** 0.60), 8, {"smooth": False, "levels": 24}),
+}
+SPRITE_FLIP = {"lamp"}
+
+# budget dei livelli LOD a RENDER_K = 1: i byte crescono con l'area del render target
+SPRITE_BUDGET = 64 * 1024 * 1024
+
+def sprite_budget():
+    return int(SPRITE_BUDGET * RENDER_K ** 2)
+
+SPRITES = SpriteCache(budget_bytes=sprite_budget())
+
+def set_sprite(name, img, src_size):
+    # le curve di scala sono in proporzione all'immagine sorgente, non alla base pre-scalata dell'atlas
+    IMAGES[name] = img
+    SRC_SIZE[name] = src_size
+    k, min_px, opts = SPRITE_LOD[name]
+    SPRITES.register(name, img, _sized(name, k, min_px), **opts)
+
+for _name, _img in IMAGES.items():
+    set_sprite(_name, _img, _img.get_size())
+
+# condivisi tra le partite: il reset crea solo il Player della simulazione
+PLAYER_ROT = RotationFrames(PLAYER_LEAN_DEG, PLAYER_ROT_STEP_DEG)
+PLAYER_ROT.build(SPRITES.get("player", 1.0))
+
+def baked_matches(section, expected):
+    """I livelli/coni nell'atlas valgono solo se cotti con la stessa configurazione."""
+    return (BAKED is not None and BAKED.manifest.get("view") == [VIEW.width, VIEW.height]
+            and BAKED.manifest.get(section) == expected)
 
 # =============================
 # ROAD
 # =============================
-def road_half_width_at_y(y):
-    t = clamp((y - HORIZON_Y) / (BOTTOM_Y - HORIZON_Y), 0, 1)
-    return (ROAD_FAR_W + (ROAD_NEAR_W - ROAD_FAR_W) * (t ** 0.55)) / 2
+def _dash_img():
+    s = pygame.Surface((px(6), px(26)), pygame.SRCALPHA)
+    pygame.draw.rect(s, (10, 10, 10), s.get_rect(), border_radius=px(3))
+    return s
+
+def _dash_strip():
+    # tutti i trattini in una superficie: un blit per frame invece di uno per trattino
+    v = VIEW
+    ys = range(0, v.bottom_y + px(160) - v.road_top, px(44))
+    s = pygame.Surface((DASH_IMG.get_width(), ys[-1] + DASH_IMG.get_height()), pygame.SRCALPHA)
+    for y in ys:
+        s.blit(DASH_IMG, (0, y))
+    return s
+
+DASH_IMG = _dash_img()
+DASH_STRIP = _dash_strip()
 
 def draw_road(surf, t_ms, night):
-    far = ROAD_FAR_W / 2
-    near = ROAD_NEAR_W / 2
+    draw_road_body(surf, night)
+    draw_road_dashes(surf, t_ms)
+
+def draw_road_body(surf, night):
+    v = VIEW
+    far = v.road_far_w / 2
+    near = v.road_near_w / 2
     pts = [
-        (WIDTH / 2 - far, HORIZON_Y),
-        (WIDTH / 2 + far, HORIZON_Y),
-        (WIDTH / 2 + near, BOTTOM_Y),
-        (WIDTH / 2 - near, BOTTOM_Y),
+        (v.cx - far, v.horizon_y),
+        (v.cx + far, v.horizon_y),
+        (v.cx + near, v.bottom_y),
+        (v.cx - near, v.bottom_y),
     ]
 
     day = (155, 155, 162)
@@ -122,19 +334,25 @@ def draw_road(surf, t_ms, night):
     pygame.draw.polygon(surf, col, pts)
 
     edge = tuple(int(lerp(245, 220, night)) for _ in range(3))
-    pygame.draw.line(surf, edge, pts[0], pts[3], 6)
-    pygame.draw.line(surf, edge, pts[1], pts[2], 6)
+    pygame.draw.line(surf, edge, pts[0], pts[3], px(6))
+    pygame.draw.line(surf, edge, pts[1], pts[2], px(6))
+
+def dash_blits(out, t_ms):
+    # centro tratteggiato NERO (la striscia scorre di off dentro un passo)
+    v = VIEW
+    off = int((t_ms * 0.32 * RENDER_K) % px(44))
+    x = v.width // 2 - DASH_IMG.get_width() // 2
+    out.append((DASH_STRIP, DASH_STRIP.get_rect(topleft=(x, v.road_top + off))))
+    return out
 
-    # centro tratteggiato NERO
-    off = int((t_ms * 0.32) % 44)
-    for y in range(HORIZON_Y + 10, int(BOTTOM_Y) + 160, 44):
-        pygame.draw.rect(surf, (10, 10, 10), (WIDTH // 2 - 3, y + off, 6, 26), border_radius=3)
+def draw_road_dashes(surf, t_ms):
+    surf.blits(dash_blits([], t_ms), doreturn=False)
 
 # =============================
 # DAY / NIGHT
 # =============================
 def night_factor(now_ms):
-    t = (now_ms - APP_START_MS) / 1000.0
+    t = now_ms / 1000.0
     half = DAY_NIGHT_PERIOD_S / 2.0
 
     target = 0.0 if (t % DAY_NIGHT_PERIOD_S) < half else 1.0
@@ -151,418 +369,561 @@ def night_factor(now_ms):
 # =============================
 # LAMP LIGHT (SOFT CONE GRADIENT)
 # =============================
-_cone_cache = {}
+CONE_BUDGET = 24 * 1024 * 1024  # minimo; si allarga se le celle dei lampioni non ci stanno
+CONES = ConeAtlas(budget_bytes=CONE_BUDGET)
 
 def soft_cone_light(w, h, intensity):
-    key = (w, h, intensity)
-    if key in _cone_cache:
-        return _cone_cache[key]
-
-    s = pygame.Surface((w, h), pygame.SRCALPHA)
-    cx = w // 2
-    start_y = int(h * 0.04)
-
-    r0 = max(6, int(w * 0.035))
-    r1 = max(18, int(w * 0.46))
-
-    layers = 46
-    for i in range(layers):
-        t = i / (layers - 1)
-        grow = t ** 0.70
-        r = int(lerp(r0, r1, grow))
-        y = int(lerp(start_y, h - 1, t))
-
-        a = int(intensity * ((1.0 - t) ** 1.30))
-        if a <= 0:
-            continue
-        pygame.draw.circle(s, (255, 235, 190, a), (cx, y), r)
+    # dimensione quantizzata sulla griglia dell'atlas: usare get_width/get_height del risultato
+    return CONES.get(w, h, intensity)
 
-    _cone_cache[key] = s
-    return s
+def cone_sizes():
+    # tutte le dimensioni che i lampioni possono chiedere (cotte dal loader, se non gia' nell'atlas)
+    return sorted({(VIEW.cone_w[y], VIEW.cone_h[y]) for y in range(VIEW.road_top, VIEW.bottom_y + 1)})
+
+def cone_budget():
+    # le celle crescono in numero e in area con la risoluzione: tutte quelle usate devono starci
+    return max(CONE_BUDGET, CONES.bytes_for(CONE_SIZES))
+
+CONE_SIZES = cone_sizes()
+CONES.budget_bytes = cone_budget()
 
 # =============================
-# LAMPS
+# ASSET LOADING
 # =============================
-def draw_lamps(surf, night, t_ms):
-    step = 140
-    scroll = int((t_ms * 0.12) % step)
+# Un job per asset, nell'ordine: prima l'atlas (o il player, che serve alla
+# simulazione per la larghezza), poi sfondo, sprite e coni. Ogni `yield` e' un
+# punto in cui il loop puo' disegnare un frame.
+LOADER = AssetLoader()
+
+def _atlas_job():
+    global BAKED
+    name = BAKED_MANIFEST["atlas"]
+    data = LOADER.read("atlas", os.path.join(BAKED_DIR, name))
+    yield "read"
+    BAKED = atlas.Atlas(BAKED_DIR, BAKED_MANIFEST, decode(data, name))
+    yield "decode"
+    for n in SPRITE_FILES:
+        set_sprite(n, BAKED.get("sprite", n), tuple(BAKED_MANIFEST["src_size"][n]))
+    if baked_matches("lod_levels", {n: SPRITES.level_count(n) for n in SPRITE_FILES}):
+        for (n, lvl, flip), img in BAKED.items("lod"):
+            SPRITES.preload(n, lvl, bool(flip), img)
+    if baked_matches("cones", {"grid": CONES.grid, "layers": CONES.layers}):
+        for (w, h), img in BAKED.items("cone"):
+            CONES.preload(w, h, img)
+    yield "unpack"
+
+def _sprite_job(name):
+    if BAKED is None:
+        fname, _, _, trim = SPRITE_FILES[name]
+        data = LOADER.read(name, os.path.join(ASSETS_DIR, fname))
+        yield "read"
+        img = decode(data, fname)
+        yield "decode"
+        if trim:
+            img = trim_alpha(img)
+            yield "trim"
+        set_sprite(name, img, img.get_size())
+    for _ in SPRITES.prebake_iter(name, flip=name in SPRITE_FLIP):
+        yield "scale"
+    if name == "player":
+        for _ in PLAYER_ROT.build_iter(SPRITES.get("player", 1.0)):
+            yield "rotate"
+
+def _bg_job():
+    global BG_IMG, BG_SRC
+    if BAKED is not None and BAKED.manifest.get("bg"):
+        path, fname = BAKED_DIR, BAKED.manifest["bg"]
+    else:
+        path, fname = ASSETS_DIR, BG_FILE
+    data = LOADER.read("bg", os.path.join(path, fname))
+    yield "read"
+    BG_SRC = decode(data, fname, alpha=False)
+    yield "decode"
+    BG_IMG = fit_bg(BG_SRC)
+    yield "scale"
+    RENDERER.invalidate(static=True)
+
+def fit_bg(img):
+    size = screen.get_size()
+    return img if img.get_size() == size else pygame.transform.smoothscale(img, size)
+
+def _cones_job():
+    for w, h in CONE_SIZES:
+        CONES.get(w, h, 255)
+        yield "bake"
+
+if BAKED_MANIFEST is not None:
+    LOADER.add("atlas", _atlas_job())
+LOADER.add("player", _sprite_job("player"))
+LOADER.add("bg", _bg_job())
+for _name in SPRITE_FILES:
+    if _name != "player":
+        LOADER.add(_name, _sprite_job(_name))
+LOADER.add("cones", _cones_job())
 
-    for y in range(HORIZON_Y + 10, int(BOTTOM_Y) + step, step):
+# =============================
+# LAMPS
+# =============================
+def lamp_blits(out, night, t_ms, step=140, cone_scale=1.0):
+    v = VIEW
+    step = px(step)
+    scroll = int((t_ms * 0.12 * RENDER_K) % step)
+    last = SPRITES.level_count("lamp") - 1
+    lamps, lamps_r = SPRITES.table("lamp"), SPRITES.table("lamp", flip=True)
+    lookup = SPRITES.lookup
+    cones = night > 0.02 and cone_scale > 0
+
+    for y in range(v.road_top, v.bottom_y + step, step):
         yy = y + scroll
-        if yy < HORIZON_Y + 10 or yy > BOTTOM_Y:
+        if yy < v.road_top or yy > v.bottom_y:
             continue
 
-        t = clamp((yy - HORIZON_Y) / (BOTTOM_Y - HORIZON_Y), 0.0, 1.0)
-        t2 = t ** 0.60
-        half = road_half_width_at_y(yy)
-
-        inset = int(lerp(6, 18, t2))
-        lx = int(WIDTH / 2 - half + inset)
-        rx = int(WIDTH / 2 + half - inset)
+        half = v.half_w[yy]
+        inset = v.lamp_inset[yy]
+        lx = int(v.cx - half + inset)
+        rx = int(v.cx + half - inset)
 
-        base_y = min(int(yy + HEIGHT * 0.15), int(BOTTOM_Y))
+        # stesso livello di SPRITES.get("lamp", row_t), letto dalla tabella
+        lvl = int(clamp(v.row_t[yy], 0.0, 1.0) * last + 0.5)
+        lamp, hw, _, w, h = lookup(lamps, "lamp", lvl)
+        lamp_r = lookup(lamps_r, "lamp", lvl, True)[0]
+        top = v.lamp_base_y[yy] - h
 
-        scale = lerp(0.10, 0.42, t2)
-        w = max(8, int(LAMP_IMG.get_width() * scale))
-        h = max(8, int(LAMP_IMG.get_height() * scale))
+        out.append((lamp, pygame.Rect(lx - hw, top, w, h)))
+        out.append((lamp_r, pygame.Rect(rx - hw, top, w, h)))
 
-        lamp = pygame.transform.scale(LAMP_IMG, (w, h))
-        lamp_r = pygame.transform.flip(lamp, True, False)
-
-        rL = lamp.get_rect(midbottom=(lx, base_y))
-        rR = lamp_r.get_rect(midbottom=(rx, base_y))
+        if cones:
+            intensity = int(lerp(0, 155, night) * v.lamp_light[yy])
+            intensity = clamp(intensity, 0, 170)
 
-        surf.blit(lamp, rL)
-        surf.blit(lamp_r, rR)
+            if cone_scale == 1.0:
+                cone = soft_cone_light(v.cone_w[yy], v.cone_h[yy], intensity)
+            else:
+                cone = soft_cone_light(int(v.cone_w[yy] * cone_scale), int(v.cone_h[yy] * cone_scale), intensity)
+            cw, ch = cone.get_size()
 
-        if night > 0.02:
-            intensity = int(lerp(0, 155, night) * lerp(0.55, 1.05, t2))
-            intensity = clamp(intensity, 0, 170)
+            # teste dei lampioni: L e R sono specchiati
+            hx = int(w * 0.26)
+            hy = top + int(h * 0.36)
+            out.append((cone, pygame.Rect(lx + hx - cw // 2, hy, cw, ch)))
+            out.append((cone, pygame.Rect(rx - hx - cw // 2, hy, cw, ch)))
+    return out
 
-            cone_h = int(lerp(140, 520, t2) * 1.30)
-            cone_w = int(lerp(120, 520, t2) * 1.15)
-
-            cone = soft_cone_light(cone_w, cone_h, intensity)
-
-            headL = (rL.centerx + int(w * 0.26), rL.top + int(h * 0.36))
-            headR = (rR.centerx - int(w * 0.26), rR.top + int(h * 0.36))
-
-            for (hx, hy) in (headL, headR):
-                surf.blit(cone, (hx - cone_w // 2, hy))
-
-# =============================
-# ENTITIES
-# =============================
-class Player:
-    def __init__(self):
-        self.lane_x = 0.0
-        self.y = int(HEIGHT * 0.88)
-
-        self.air = 0.0
-        self.v_air = 0.0
-        self.gravity = 2.9
-        self.jump_strength = 1.35
-        self.on_ground = True
-
-        w = int(PLAYER_IMG.get_width() * 0.27)
-        h = int(PLAYER_IMG.get_height() * 0.27)
-        self.img_base = pygame.transform.smoothscale(PLAYER_IMG, (w, h))
-
-        self.steer_vis = 0.0
-
-    def jump(self, m=1.0):
-        if self.on_ground:
-            self.v_air = self.jump_strength * m
-            self.on_ground = False
-
-    def _max_lane_x(self):
-        """
-        Ora la macchina può uscire un po' di più a sx/dx:
-        lasciamo andare oltre la riga bianca di ~0.9 larghezza auto (quasi una macchina),
-        ma senza sparire completamente (almeno un pezzo resta in strada).
-        """
-        half = road_half_width_at_y(self.y)
-        sprite_half = self.img_base.get_width() / 2
-
-        # prima era molto più restrittivo; ora permettiamo "quasi una macchina" oltre.
-        extra = sprite_half * 0.90  # <-- quasi larghezza auto
-        margin = 6                 # lascia almeno un filo di contatto
-
-        # "spazio utilizzabile" per il centro della macchina
-        usable = max(10.0, (half + extra) - sprite_half - margin)
-        return clamp(usable / half, 0.15, 1.25)  # può superare 1.0 (oltre bordo strada)
-
-    def update(self, dt, steer):
-        max_lane = self._max_lane_x()
-        self.lane_x = clamp(self.lane_x + steer * 1.75 * dt, -max_lane, max_lane)
-
-        target = clamp(steer, -1.0, 1.0)
-        self.steer_vis = lerp(self.steer_vis, target, clamp(dt * 10.0, 0.0, 1.0))
-
-        if not self.on_ground:
-            self.air += self.v_air * dt * 2.2
-            self.v_air -= self.gravity * dt * 2.2
-            if self.air <= 0.0:
-                self.air = 0.0
-                self.v_air = 0.0
-                self.on_ground = True
-
-    def x(self):
-        half = road_half_width_at_y(self.y)
-        return int(WIDTH / 2 + self.lane_x * half)
-
-    def draw(self, s):
-        lift = int(72 * self.air)
-        angle = -self.steer_vis * 12.0
-        img = self.img_base if abs(angle) < 0.2 else pygame.transform.rotate(self.img_base, angle)
-        s.blit(img, img.get_rect(center=(self.x(), self.y - lift)))
-
-class Thing:
-    def __init__(self, kind):
-        self.kind = kind
-        self.d = 1.0 + random.uniform(0.02, 0.15)
-
-        if kind == "suv":
-            self.lane_x = clamp(random.gauss(0.0, 0.42), -0.95, 0.95)
-            self.var = random.choice([1, 2])
-
-            self.lane_v = random.uniform(-0.08, 0.08)
-            self.wobble_amp = random.uniform(0.00, 0.06)
-            self.wobble_f   = random.uniform(0.8, 1.6)
-            self.wobble_p   = random.uniform(0, math.tau)
-        else:
-            self.lane_x = clamp(random.gauss(0.0, 0.35), -0.90, 0.90)
-            self.var = 0
-            self.lane_v = 0.0
-            self.wobble_amp = 0.0
-            self.wobble_f = 0.0
-            self.wobble_p = 0.0
-
-        self.t_alive = 0.0
-
-    def update(self, dt, speed):
-        self.d -= speed * dt
-        self.t_alive += dt
-
-        if self.kind == "suv":
-            if random.random() < 0.015:
-                self.lane_v += random.uniform(-0.10, 0.10)
-                self.lane_v = clamp(self.lane_v, -0.20, 0.20)
-
-            self.lane_v += (-self.lane_x) * 0.06 * dt
-            self.lane_x += self.lane_v * dt
-            self.lane_x += math.sin(self.t_alive * self.wobble_f + self.wobble_p) * self.wobble_amp * dt
-            self.lane_x = clamp(self.lane_x, -0.95, 0.95)
-
-    def dead(self):
-        return self.d < -0.2
-
-    def pos(self):
-        t = clamp(1.0 - self.d, 0.0, 1.0)
-        y = int(lerp(HORIZON_Y + 10, HEIGHT * 0.90, t))
-        x = int(WIDTH / 2 + self.lane_x * road_half_width_at_y(y))
-        s = lerp(0.18, 1.0, t)
-        return x, y, s
-
-    def draw(self, s):
-        x, y, sc = self.pos()
-        src = RAMP_IMG if self.kind == "ramp" else (SUV1_IMG if self.var == 1 else SUV2_IMG)
-
-        w = max(10, int(src.get_width() * 0.22 * sc))
-        h = max(10, int(src.get_height() * 0.22 * sc))
-        img = pygame.transform.smoothscale(src, (w, h))
-        s.blit(img, img.get_rect(center=(x, y)))
-
-    def hit(self, p):
-        if not (0.0 <= self.d <= 0.1):
-            return False
-        x, _, _ = self.pos()
-        return abs(p.x() - x) < 75
+def draw_lamps(surf, night, t_ms, step=140, cone_scale=1.0):
+    surf.blits(lamp_blits([], night, t_ms, step, cone_scale), doreturn=False)
 
 # =============================
-# GAME STATE
+# ENTITIES (solo disegno, la fisica e' in sim.py)
 # =============================
-def reset():
-    now = pygame.time.get_ticks()
-    return {"player": Player(), "things": [], "score": 0.0, "start": now, "last_spawn": now, "over": False}
+def player_blits(out, p):
+    lift = int(72 * p.air * RENDER_K)
+    img = PLAYER_ROT.get(-p.steer_vis * PLAYER_LEAN_DEG)
+    out.append((img, img.get_rect(center=(VIEW.lane_to_x(p.lane_x, VIEW.player_y), VIEW.player_y - lift))))
+    return out
+
+def draw_player(s, p):
+    s.blits(player_blits([], p), doreturn=False)
+
+def _thing_name(kind, var):
+    return "ramp" if kind == "ramp" else ("suv1" if var == 1 else "suv2")
+
+def draw_thing(s, kind, var, d, lane_x):
+    x, y, _ = VIEW.project(d, lane_x)
+    img = SPRITES.get(_thing_name(kind, var), 1.0 - d)
+    s.blit(img, img.get_rect(center=(x, y)))
+
+def thing_blits(out, state):
+    """Come draw_thing per tutto sim.draw_list, con project e livello fatti qui in linea:
+    con decine di ostacoli il costo e' tutto nelle chiamate Python per sprite."""
+    v = VIEW
+    y0, span, cx, half_w = v.depth_y0, v.depth_span, v.cx, v.half_w
+    tables = {}
+    for name in ("ramp", "suv1", "suv2"):
+        tables[name] = (SPRITES.table(name), SPRITES.level_count(name) - 1)
+    append, rect, lookup = out.append, pygame.Rect, SPRITES.lookup
+    for kind, var, d, lane_x in sim.draw_list(state):
+        name = _thing_name(kind, var)
+        tab, last = tables[name]
+        t = 1.0 - d
+        t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+        y = int(y0 + span * t)
+        lvl = int(t * last + 0.5)
+        img, hw, hh, w, h = lookup(tab, name, lvl)
+        append((img, rect(int(cx + lane_x * half_w[y]) - hw, y - hh, w, h)))
+    return out
+
+def night_overlay_alpha(night):
+    # overlay notte: più chiaro
+    return int(lerp(0, 70, night))
 
 # =============================
-# ASYNC MAIN (web-safe)
+# LAYERED RENDER
 # =============================
-async def main():
-    state = reset()
-    runtime_error = None
-    started = False
+def build_static_layer(night):
+    s = BG_IMG.copy()
+    draw_road_body(s, night)
+    return s
+
+RENDERER = LayeredRenderer(screen, build_static_layer, night_overlay_alpha, dirty=DIRTY_RECTS, flip=present)
+
+QUALITY = QualityController(FPS)
+if QUALITY_PIN:
+    QUALITY.pin(QUALITY_PIN)
 
-    active_fingers = {}
-    mouse_down = False
-    mouse_pos = (0, 0)
+ERRORS = ErrorLog(clock=lambda: CLOCK.now)
 
-    LEFT_ZONE  = pygame.Rect(0, 0, int(WIDTH * 0.42), HEIGHT)
-    RIGHT_ZONE = pygame.Rect(int(WIDTH * 0.58), 0, int(WIDTH * 0.42), HEIGHT)
+PROF = FrameProfiler()
+PROF.watch("things", lambda: sim.POOL.allocated)  # Thing creati a pool vuoto
+if PROFILE:
+    PROF.toggle()
 
-    BTN_R = int(min(WIDTH, HEIGHT) * 0.11)
-    JUMP_C = (int(WIDTH * 0.88), int(HEIGHT * 0.60))
+def quit_game(recorder, state):
+    save_replay(recorder, state)
+    if PROF.enabled and PROFILE.endswith((".csv", ".json")):
+        PROF.dump(PROFILE)
+    if PROFILE:
+        print("input -> present:", CONTROLS.stats())
+
+# =============================
+# TOUCH LAYOUT
+# =============================
+# in pixel del render target: si ricalcola con la risoluzione
+CONTROLS = Controls(to_render, display.get_size())
+PROF.gauge("input_ms", lambda: CONTROLS.frame_latency)  # latenza input -> present, nei frame che la chiudono
+
+def layout():
+    global LEFT_ZONE, RIGHT_ZONE, BTN_R, JUMP_C, JUMP_BTN, RESTART_C, RESTART_BTN
+    w, h = screen.get_size()
+    LEFT_ZONE  = pygame.Rect(0, 0, int(w * 0.42), h)
+    RIGHT_ZONE = pygame.Rect(int(w * 0.58), 0, int(w * 0.42), h)
+
+    BTN_R = int(min(w, h) * 0.11)
+    JUMP_C = (int(w * 0.88), int(h * 0.60))
     JUMP_BTN = pygame.Rect(JUMP_C[0] - BTN_R, JUMP_C[1] - BTN_R, BTN_R * 2, BTN_R * 2)
 
-    RESTART_C = (int(WIDTH * 0.12), int(HEIGHT * 0.60))
+    RESTART_C = (int(w * 0.12), int(h * 0.60))
     RESTART_BTN = pygame.Rect(RESTART_C[0] - BTN_R, RESTART_C[1] - BTN_R, BTN_R * 2, BTN_R * 2)
+    CONTROLS.set_zones(LEFT_ZONE, RIGHT_ZONE, JUMP_BTN, RESTART_BTN)
 
-    def finger_to_xy(x_norm, y_norm):
-        return int(x_norm * WIDTH), int(y_norm * HEIGHT)
+layout()
 
-    def draw_circle_button(surf, center, radius, label, active=False):
-        cx, cy = center
-        btn = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
-        pygame.draw.circle(btn, (0, 0, 0, 120 if not active else 170), (radius, radius), radius)
-        pygame.draw.circle(btn, (255, 255, 255, 180), (radius, radius), radius - 4, width=4)
-        surf.blit(btn, (cx - radius, cy - radius))
-        draw_text(surf, label, cx, cy, center=True, color=(255, 255, 255), fnt=font)
+def draw_circle_button(surf, center, radius, label, active=False):
+    cx, cy = center
+    surf.blit(button_img(radius, active), (cx - radius, cy - radius))
+    draw_text(surf, label, cx, cy, center=True, color=(255, 255, 255), fnt=font)
+
+def draw_touch_overlay(surf, jump, show_restart, restart_active):
+    draw_circle_button(surf, JUMP_C, BTN_R, "JUMP", active=jump)
+    if show_restart:
+        draw_circle_button(surf, RESTART_C, BTN_R, "R", active=restart_active)
+
+# =============================
+# RENDER TARGET
+# =============================
+def set_render_size(size):
+    """Cambia la risoluzione interna e rifa' quello che ne deriva; True se e' cambiata.
+    Tabelle, layout, sfondo e target subito; livelli degli sprite, frame del player e
+    coni li ricuoce il loader a pezzi (nel frattempo sprite e coni si costruiscono su
+    richiesta e il player si disegna dritto, gia' alla misura nuova)."""
+    global BG_IMG, DASH_IMG, DASH_STRIP, CONE_SIZES
+    size = tuple(size)
+    if size == screen.get_size():
+        return False
+    _target(size)
+    TEXT.clear()  # font nuovi: testi e glifi dei vecchi non servono piu'
+    layout()
+    BG_IMG = fit_bg(BG_SRC)
+    DASH_IMG = _dash_img()
+    DASH_STRIP = _dash_strip()
+    CONE_SIZES = cone_sizes()
+    SPRITES.budget_bytes = sprite_budget()  # prima di register: i livelli vecchi li butta quello
+    CONES.budget_bytes = cone_budget()      # i coni di troppo escono al prossimo inserimento
+    for name in SPRITE_FILES:
+        set_sprite(name, IMAGES[name], SRC_SIZE[name])
+    PLAYER_ROT.reset(SPRITES.get("player", 1.0))
+    RENDERER.set_target(screen)
+    LOADER.add("rescale", _rescale_job())
+    return True
+
+def _rescale_job():
+    # prima il player: e' l'unico sprite che resta a schermo sempre
+    for _ in PLAYER_ROT.build_iter(SPRITES.get("player", 1.0)):
+        yield "rotate"
+    for name in SPRITE_FILES:
+        for _ in SPRITES.prebake_iter(name, flip=name in SPRITE_FLIP):
+            yield "scale"
+    yield from _cones_job()
+
+def apply_quality():
+    """Porta il render target alla render_scale del livello di qualita' corrente."""
+    s = QUALITY.settings.get("render_scale", 1.0)
+    return set_render_size((int(RENDER_SIZE[0] * s), int(RENDER_SIZE[1] * s)))
+
+apply_quality()
+
+# =============================
+# FRAME
+# =============================
+# tutti i blit del mondo di un frame, in ordine di disegno: gli stage li accodano
+# e si passano a Surface.blits in una volta sola
+BATCH = []
+
+def draw_hud(ui, state, night, jump_active, restart_active):
+    hud_color = (10, 10, 10) if night < 0.5 else (240, 240, 240)
+    draw_text(ui, "RIDERS", px(18), px(12), color=hud_color)
+    draw_score(ui, f"{'Night' if night > 0.5 else 'Day'} | Score: ", state["score"], px(18), px(38), hud_color)
+    draw_text(ui, f"Quality: {QUALITY.name}", px(18), px(64), color=hud_color)
+
+    draw_touch_overlay(
+        ui,
+        jump=jump_active,
+        show_restart=state["over"],
+        restart_active=restart_active
+    )
+
+    cx, cy = VIEW.width // 2, VIEW.height // 2
+    if state["over"]:
+        draw_text(ui, "GAME OVER", cx, cy - px(35), center=True, fnt=big_font, color=hud_color)
+        draw_text(ui, "Tap R (or press R) to restart", cx, cy + px(20), center=True, color=hud_color)
+
+def draw_frame(state, night, now, layered=True, jump_active=False, restart_active=False):
+    # DRAW: gli stage del mondo riempiono BATCH, che va al world con un solo blits (in
+    # modalita' layered anche quello accoda soltanto, i blit veri sono in "present");
+    # ogni stage e' protetto: se solleva salta il frame dopo e gli altri vanno avanti
+    if layered:
+        RENDERER.begin(night)
+        world, ui = RENDERER.world, RENDERER.ui
+    else:
+        screen.blit(BG_IMG, (0, 0))
+        draw_road_body(screen, night)
+        world = ui = screen
+
+    batch = BATCH
+    batch.clear()
+    ERRORS.guard("road", dash_blits, batch, now)
+    PROF.mark("road")
+    q = QUALITY.settings
+    ERRORS.guard("lamps", lamp_blits, batch, night, now, q["lamp_step"], q["cone_scale"])
+    PROF.mark("lamps")
+
+    ERRORS.guard("things", thing_blits, batch, state)
+    PROF.mark("things")
+
+    ERRORS.guard("player", player_blits, batch, state["player"])
+    PROF.mark("player")
+
+    world.blits(batch, doreturn=False)
+    PROF.mark("blits")
 
-    def draw_touch_overlay(surf, jump, show_restart, restart_active):
-        draw_circle_button(surf, JUMP_C, BTN_R, "JUMP", active=jump)
-        if show_restart:
-            draw_circle_button(surf, RESTART_C, BTN_R, "R", active=restart_active)
+    if night > 0 and not layered:
+        # nero opaco + alpha di superficie: stessa resa dell'overlay SRCALPHA, nessuna Surface nuova
+        ov = scratch("night", screen.get_size())
+        ov.set_alpha(night_overlay_alpha(night))
+        screen.blit(ov, (0, 0))
+
+    ERRORS.guard("hud", draw_hud, ui, state, night, jump_active, restart_active)
+    if ERRORS.visible():
+        ui.blit(ERRORS.overlay(font, VIEW.width - px(24)), (px(12), px(92)))
+
+    # ancorato a destra: il grafico ha misura fissa, la legenda segue il font
+    PROF.draw(ui, draw_text, VIEW.width - GRAPH_W - px(12), px(12), font.get_linesize())
+    PROF.mark("hud")
+
+    ERRORS.guard("present", RENDERER.present if layered else present)
+    PROF.mark("present")
+
+# =============================
+# GAME STATE
+# =============================
+def player_width():
+    # in pixel logici: le collisioni non dipendono dalla risoluzione di render.
+    # Mai da SRC_SIZE: al primo tap il player puo' essere ancora il placeholder;
+    # senza atlas si legge la larghezza dall'header del PNG (il player non si rifila)
+    if BAKED_MANIFEST is not None:
+        src_w = BAKED_MANIFEST["src_size"]["player"][0]
+    else:
+        src_w = png_width(os.path.join(ASSETS_DIR, SPRITE_FILES["player"][0]))
+    if not src_w:
+        return sim.PLAYER_W  # file mancante: il loader lascia il placeholder
+    return max(1, int(src_w * SPRITE_LOD["player"][0](1.0)))
+
+def reset():
+    return sim.new_state(player_w=player_width(), vectorized=VECTOR_OBSTACLES)
+
+def save_replay(recorder, state):
+    # una scena parte da ostacoli e regole che l'header del replay non contiene:
+    # il file non si potrebbe rigiocare
+    if not REPLAY_DIR or SCRIPT:
+        return
+    try:
+        os.makedirs(REPLAY_DIR, exist_ok=True)
+        recorder.save(os.path.join(REPLAY_DIR, f"riders-{state['seed']}.rpl"), state)
+    except OSError as e:
+        print("replay non salvato:", e)
+
+def draw_start_screen():
+    cx, cy = VIEW.width // 2, VIEW.height // 2
+    screen.fill((0, 0, 0))
+    draw_text(screen, "RIDERS", cx, cy - px(40), center=True, fnt=big_font)
+    draw_text(screen, "TAP TO START", cx, cy + px(10), center=True, color=(180, 180, 180))
+    if not LOADER.finished:
+        bar = pygame.Rect(cx - px(150), cy + px(50), px(300), px(8))
+        pygame.draw.rect(screen, (60, 60, 60), bar)
+        pygame.draw.rect(screen, (200, 200, 200), (bar.x, bar.y, int(bar.w * LOADER.progress), bar.h))
+        draw_text(screen, f"loading {int(LOADER.progress * 100)}%", cx, bar.bottom + px(16),
+                  center=True, color=(120, 120, 120))
+    present()
+
+def load_step(budget_ms):
+    if LOADER.finished:
+        return
+    if LOADER.step(budget_ms) and PROFILE:
+        for line in LOADER.lines():
+            print(line)
+
+# =============================
+# SCENE SCRIPT
+# =============================
+SCRIPT = scene.load(SCENE) if SCENE else None
+NIGHT_PIN = None  # notte fissata dalla scena (None = ciclo giorno/notte)
+
+def apply_scene(step, state):
+    """Applica un passo dello script; ritorna lo stato (nuovo se il passo tocca ostacoli, seed o regole)."""
+    global NIGHT_PIN
+    if "time_ms" in step:
+        CLOCK.ms = float(step["time_ms"])
+    if "rate" in step:
+        CLOCK.rate = step["rate"]
+    if "fixed_dt" in step:
+        CLOCK.fixed_ms = sim.DT * 1000.0 if step["fixed_dt"] else None
+    if "night" in step:
+        NIGHT_PIN = step["night"]
+    if "quality" in step:
+        QUALITY.pin(step["quality"])
+        apply_quality()
+    if SCRIPT.wants_state(step):
+        opts = {k: step[k] for k in ("seed", "rules", "steer_vis") if k in step}
+        if state is not None:
+            state["things"].clear()  # i Thing della scena vecchia tornano nel pool
+        state = scene.scene_state(step.get("obstacles", 0), player_w=player_width(),
+                                  vectorized=VECTOR_OBSTACLES, **opts)
+        RENDERER.invalidate()
+    return state
+
+# =============================
+# ASYNC MAIN (web-safe)
+# =============================
+async def main():
+    state = recorder = None  # la partita nasce al tap
+    started = False
+    layered = LAYERED_RENDER
+
+    acc = 0.0
+    frame = 0
+
+    if SCRIPT:
+        LOADER.run()  # la scena parte con tutti gli asset: niente frame di caricamento nella cattura
+        started = True
+        state = reset()
+        recorder = replay.Recorder(state)
 
     while True:
         try:
-            dt = clock.tick(FPS) / 1000.0
-            now = pygame.time.get_ticks()
-            night = night_factor(now)
+            real_ms = clock.tick(FPS)
+            PROF.begin_frame()
+            ERRORS.begin_frame()
+
+            if SCRIPT and started:
+                for step in SCRIPT.due(frame):
+                    if step.get("quit"):
+                        quit_game(recorder, state)
+                        return
+                    new = apply_scene(step, state)
+                    if new is not state:
+                        state, recorder = new, replay.Recorder(new)
+                frame += 1
+
+            dt = CLOCK.tick(real_ms) / 1000.0  # dopo la scena: rate e passo fisso valgono gia' da questo frame
+            now = CLOCK.now
+            night = night_factor(now) if NIGHT_PIN is None else NIGHT_PIN
 
             if not started:
-                screen.fill((0, 0, 0))
-                draw_text(screen, "RIDERS", WIDTH // 2, HEIGHT // 2 - 40, center=True, fnt=big_font)
-                draw_text(screen, "TAP TO START", WIDTH // 2, HEIGHT // 2 + 10, center=True, color=(180, 180, 180))
-                pygame.display.flip()
+                load_step(LOAD_BUDGET_MS_START)
+                draw_start_screen()
 
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:
                         return
                     if event.type in (pygame.MOUSEBUTTONDOWN, pygame.FINGERDOWN, pygame.KEYDOWN):
                         started = True
+                        state = reset()
+                        recorder = replay.Recorder(state)
+                        CONTROLS.sync_keys()
 
                 await asyncio.sleep(0)
                 continue
 
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return
-
-                if event.type == pygame.KEYDOWN:
-                    if (not state["over"]) and event.key == pygame.K_SPACE:
-                        state["player"].jump(MANUAL_JUMP_MULT)
-                    elif state["over"] and event.key == pygame.K_r:
-                        state = reset()
-
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    mouse_down = True
-                    mouse_pos = event.pos
-                elif event.type == pygame.MOUSEMOTION and mouse_down:
-                    mouse_pos = event.pos
-                elif event.type == pygame.MOUSEBUTTONUP:
-                    mouse_down = False
-
-                if event.type == pygame.FINGERDOWN:
-                    fid = getattr(event, "finger_id", 0)
-                    active_fingers[fid] = finger_to_xy(event.x, event.y)
-                elif event.type == pygame.FINGERMOTION:
-                    fid = getattr(event, "finger_id", 0)
-                    if fid in active_fingers:
-                        active_fingers[fid] = finger_to_xy(event.x, event.y)
-                elif event.type == pygame.FINGERUP:
-                    fid = getattr(event, "finger_id", 0)
-                    active_fingers.pop(fid, None)
-
-            pressed_left = pressed_right = pressed_jump = pressed_restart = False
-
-            keys = pygame.key.get_pressed()
-            steer = 0.0
-            if keys[pygame.K_a] or keys[pygame.K_LEFT]:
-                steer -= 1.0
-            if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
-                steer += 1.0
-
-            pointers = []
-            if mouse_down:
-                pointers.append(mouse_pos)
-            pointers.extend(active_fingers.values())
-
-            for (mx, my) in pointers:
-                if LEFT_ZONE.collidepoint(mx, my):
-                    pressed_left = True
-                if RIGHT_ZONE.collidepoint(mx, my):
-                    pressed_right = True
-                if JUMP_BTN.collidepoint(mx, my):
-                    pressed_jump = True
-                if state["over"] and RESTART_BTN.collidepoint(mx, my):
-                    pressed_restart = True
-
-            if pressed_left and not pressed_right:
-                steer = -1.0
-            elif pressed_right and not pressed_left:
-                steer = 1.0
-
-            if pressed_jump and (not state["over"]):
-                state["player"].jump(MANUAL_JUMP_MULT)
-
-            if pressed_restart and state["over"]:
-                state = reset()
-
-            elapsed = (now - state["start"]) / 1000.0
-            speed = 0.85 + 0.020 * elapsed
-
-            if not state["over"]:
-                state["player"].update(dt, steer)
-
-                if now - state["last_spawn"] > SPAWN_MS:
-                    kind = "ramp" if random.random() < RAMP_CHANCE else "suv"
-                    state["things"].append(Thing(kind))
-                    state["last_spawn"] = now
-
-                for th in state["things"]:
-                    th.update(dt, speed)
-
-                for th in list(state["things"]):
-                    if th.hit(state["player"]):
-                        if th.kind == "ramp":
-                            state["player"].jump(RAMP_JUMP_MULT)
-                            state["things"].remove(th)
-                        else:
-                            # più permissivo: se stai saltando "abbastanza", passi sopra il SUV
-                            if state["player"].air > 0.16:
-                                continue
-                            state["over"] = True
-
-                state["things"] = [t for t in state["things"] if not t.dead()]
-                state["score"] += (speed * 120) * dt
-
-            # DRAW
-            screen.blit(BG_IMG, (0, 0))
-            draw_road(screen, now, night)
-            draw_lamps(screen, night, now)
-
-            for th in sorted(state["things"], key=lambda t: t.d, reverse=True):
-                th.draw(screen)
-
-            state["player"].draw(screen)
-
-            # overlay notte: più chiaro
-            if night > 0:
-                ov = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-                ov.fill((0, 0, 0, int(lerp(0, 70, night))))
-                screen.blit(ov, (0, 0))
-
-            hud_color = (10, 10, 10) if night < 0.5 else (240, 240, 240)
-            draw_text(screen, "RIDERS", 18, 12, color=hud_color)
-            draw_text(screen, f"{'Night' if night > 0.5 else 'Day'} | Score: {int(state['score'])}", 18, 38, color=hud_color)
-
-            draw_touch_overlay(
-                screen,
-                jump=pressed_jump,
-                show_restart=state["over"],
-                restart_active=pressed_restart
-            )
-
-            if state["over"]:
-                draw_text(screen, "GAME OVER", WIDTH // 2, HEIGHT // 2 - 35, center=True, fnt=big_font, color=hud_color)
-                draw_text(screen, "Tap R (or press R) to restart", WIDTH // 2, HEIGHT // 2 + 20, center=True, color=hud_color)
-
-            if runtime_error:
-                ov = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-                ov.fill((0, 0, 0, 190))
-                screen.blit(ov, (0, 0))
-                draw_text(screen, "RUNTIME ERROR", 18, 18, color=(255, 120, 120))
-                y = 52
-                for line in runtime_error.splitlines()[:18]:
-                    draw_text(screen, line[:120], 18, y, color=(255, 255, 255))
-                    y += 24
-
-            pygame.display.flip()
+            load_step(LOAD_BUDGET_MS_GAME)
+            PROF.mark("load")
+            t_work = time.perf_counter()  # da qui: lavoro del frame, senza tick ne' budget del loader
+
+            # se lo stage eventi ha sollevato, gli eventi restano in coda per il frame dopo
+            if not ERRORS.skip("events"):
+                try:
+                    for event in pygame.event.get():
+                        if event.type == pygame.QUIT:
+                            quit_game(recorder, state)
+                            return
+                        if CONTROLS.handle(event, state["over"]):
+                            continue
+                        if event.type == pygame.KEYDOWN:
+                            if event.key == pygame.K_F2:
+                                layered = not layered
+                                RENDERER.invalidate()
+                            elif event.key == pygame.K_F3:
+                                PROF.toggle()
+                            elif event.key == pygame.K_F4:
+                                ERRORS.show = not ERRORS.show
+                            elif event.key == pygame.K_F5 and ERRORS.entries:
+                                print("errori esportati in", ERRORS.export())
+                except Exception as e:
+                    ERRORS.record("events", e)
+
+            snap = CONTROLS.snapshot(state["over"])
+            PROF.mark("events")
+
+            # SIM (timestep fisso, disaccoppiato dal framerate)
+            acc = min(acc + dt, sim.DT * MAX_STEPS_PER_FRAME)
+            if not ERRORS.skip("sim"):
+                try:
+                    while acc >= sim.DT:
+                        inputs = Inputs(snap.steer, snap.jump, snap.restart)
+                        was_over = state["over"]
+                        sim.step(state, sim.DT, inputs)
+                        recorder.record(inputs)  # solo tick simulati davvero: il replay deve tornare
+                        if state["over"] and not was_over:
+                            save_replay(recorder, state)
+                        CONTROLS.consume()
+                        snap = CONTROLS.snapshot(state["over"])
+                        acc -= sim.DT
+                except Exception as e:
+                    acc = 0.0  # il tick fallito non si ripete all'infinito
+                    ERRORS.record("sim", e)
+
+            PROF.mark("sim")
+
+            draw_frame(state, night, now, layered, snap.jump_held, snap.restart_held)
+            CONTROLS.presented()
+            # con job in coda (asset o rescale dopo un cambio di livello) gli sprite si
+            # costruiscono anche su richiesta nel frame: tempi non rappresentativi
+            if ADAPTIVE_QUALITY and LOADER.finished and QUALITY.frame((time.perf_counter() - t_work) * 1000.0):
+                apply_quality()
+            PROF.end_frame()
             await asyncio.sleep(0)
 
-        except Exception:
-            runtime_error = traceback.format_exc()
+        except Exception as e:
+            ERRORS.record("frame", e)
             await asyncio.sleep(0)
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,226 @@
+import argparse
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+
+import sim
+
+# =============================
+# MONTE CARLO (taratura difficolta', headless)
+# =============================
+# python montecarlo.py --seeds 5000
+# python montecarlo.py --sweep spawn_ms=440,520,600 --sweep hit_dx=65,75 --policy dodger --policy zigzag
+# python montecarlo.py --set clear_air=0.12 --policy mybots:careful --hist --save mc.json
+#
+# Gioca migliaia di partite con seed fissi su tutti i core (multiprocessing) e
+# riassume le distribuzioni di sopravvivenza (secondi di gioco) e punteggio per
+# ogni combinazione di regole (sim.RULES) e policy. Tutte le combinazioni usano
+# gli stessi seed: le differenze tra due configurazioni non sono rumore di seed.
+
+# =============================
+# POLICY
+# =============================
+# Una policy e' una factory: policy(seed) -> funzione state -> sim.Inputs, nuova per
+# ogni partita (puo' tenere stato e un rng suo). Quelle di un altro modulo si
+# passano come "modulo:nome".
+
+def idle(seed):
+    return lambda state: sim.NO_INPUT
+
+def zigzag(seed):
+    # la stessa di bench.py: sterza a tempo e salta ogni 1.5 s
+    def policy(state):
+        k = state["tick"]
+        return sim.Inputs(1.0 if (k // 40) % 2 else -1.0, k % 90 == 0, False)
+    return policy
+
+def wander(seed):
+    """Giocatore distratto: cambia sterzo ogni 0.2 s a caso, salta ogni tanto."""
+    rng = random.Random(seed ^ 0x5EED)
+    steer = [0.0]
+    def policy(state):
+        if state["tick"] % 12 == 0:
+            steer[0] = rng.choice((-1.0, 0.0, 1.0))
+        return sim.Inputs(steer[0], rng.random() < 0.01, False)
+    return policy
+
+def dodger(seed, look=0.45, jump_at=0.14, reaction_s=0.20):
+    """Schiva il SUV piu' vicino sulla sua traiettoria; salta se ormai non ce la fa.
+    Decide ogni reaction_s secondi (tempo di reazione), in mezzo ripete l'ultimo input."""
+    player_y = sim.VIEW.player_y
+    every = max(1, int(reaction_s * sim.TICK_HZ))
+    last = [sim.NO_INPUT]
+    def policy(state):
+        if state["tick"] % every:
+            return last[0]._replace(jump=False)
+        p = state["player"]
+        # larghezza di collisione in unita' di corsia, con un po' di margine
+        reach = state["rules"]["hit_dx"] / sim.VIEW.half_w[player_y] * 1.25
+        threat = None
+        for kind, _, d, lane_x in sim.draw_list(state):
+            if kind == "suv" and 0.0 <= d <= look and abs(lane_x - p.lane_x) < reach:
+                if threat is None or d < threat[0]:
+                    threat = (d, lane_x)
+        if threat is None:
+            steer = -0.5 if p.lane_x > 0.2 else (0.5 if p.lane_x < -0.2 else 0.0)
+            last[0] = sim.Inputs(steer, False, False)
+        else:
+            d, lane_x = threat
+            # verso il lato dell'ostacolo con piu' strada libera
+            steer = -1.0 if lane_x > p.lane_x or (lane_x == p.lane_x and p.lane_x > 0) else 1.0
+            last[0] = sim.Inputs(steer, d < jump_at and p.on_ground, False)
+        return last[0]
+    return policy
+
+POLICIES = {"idle": idle, "zigzag": zigzag, "wander": wander, "dodger": dodger}
+
+def load_policy(name):
+    if name in POLICIES:
+        return POLICIES[name]
+    mod, _, attr = name.partition(":")
+    if not attr:
+        raise ValueError(f"policy sconosciuta: {name} (note: {', '.join(POLICIES)}; oppure modulo:nome)")
+    return getattr(importlib.import_module(mod), attr)
+
+# =============================
+# RUNNER
+# =============================
+def play(job):
+    """Una partita (gira nei processi del pool): ritorna (seed, secondi, punteggio, game over)."""
+    seed, policy, rules, max_ticks, vectorized = job
+    state = sim.simulate(seed, load_policy(policy)(seed), max_ticks, vectorized=vectorized, rules=rules)
+    return seed, state["t"], state["score"], state["over"]
+
+def run(configs, seeds, max_ticks, processes, vectorized=False):
+    """configs: lista di (policy, rules); ritorna un dict per config, nello stesso ordine."""
+    jobs = [(seed, policy, rules, max_ticks, vectorized) for policy, rules in configs for seed in seeds]
+    chunk = max(1, len(jobs) // (processes * 16))
+    with multiprocessing.Pool(processes) as pool:
+        played = pool.map(play, jobs, chunksize=chunk)
+
+    out = []
+    n = len(seeds)
+    for i, (policy, rules) in enumerate(configs):
+        rows = played[i * n:(i + 1) * n]
+        out.append(summarize(policy, rules, rows))
+    return out
+
+def percentile(xs, q):
+    """xs ordinata; nearest-rank."""
+    return xs[min(len(xs) - 1, int(len(xs) * q))]
+
+def distribution(xs):
+    xs = sorted(xs)
+    d = {"mean": statistics.fmean(xs), "stdev": statistics.pstdev(xs), "min": xs[0], "max": xs[-1]}
+    for q in (0.10, 0.25, 0.50, 0.75, 0.90):
+        d[f"p{int(q * 100)}"] = percentile(xs, q)
+    return d
+
+def summarize(policy, rules, rows):
+    t = [r[1] for r in rows]
+    return {
+        "policy": policy,
+        "rules": rules,
+        "sessions": len(rows),
+        "deaths": sum(1 for r in rows if r[3]),  # le altre arrivano a --max-time
+        "survival_s": distribution(t),
+        "score": distribution([r[2] for r in rows]),
+        "survival_samples": t,
+    }
+
+# =============================
+# REPORT
+# =============================
+def rules_label(rules):
+    return " ".join(f"{k}={v}" for k, v in rules.items()) or "default"
+
+def histogram(xs, bin_s, width=50):
+    top = max(xs)
+    bins = [0] * (int(top // bin_s) + 1)
+    for x in xs:
+        bins[int(x // bin_s)] += 1
+    peak = max(bins)
+    for i, c in enumerate(bins):
+        yield f"  {i * bin_s:6.0f}-{(i + 1) * bin_s:<6.0f} {c:6d} {'#' * max(1 if c else 0, c * width // peak)}"
+
+def print_report(results, hist_bin=None):
+    print(f"{'policy':<10} {'regole':<36} {'morti':>6} {'sopr. p10':>9} {'p50':>7} {'p90':>7} {'media':>7}"
+          f" {'punti p50':>10} {'p90':>8}")
+    for r in results:
+        s, sc = r["survival_s"], r["score"]
+        print(f"{r['policy']:<10} {rules_label(r['rules']):<36} {r['deaths'] / r['sessions']:6.1%}"
+              f" {s['p10']:9.1f} {s['p50']:7.1f} {s['p90']:7.1f} {s['mean']:7.1f} {sc['p50']:10.0f} {sc['p90']:8.0f}")
+        if hist_bin:
+            for line in histogram(r["survival_samples"], hist_bin):
+                print(line)
+
+# =============================
+# CLI
+# =============================
+def parse_value(v):
+    try:
+        return int(v)
+    except ValueError:
+        return float(v)
+
+def parse_assign(s):
+    key, _, val = s.partition("=")
+    if key not in sim.RULES or not val:
+        raise argparse.ArgumentTypeError(f"atteso chiave=valore con chiave in {', '.join(sim.RULES)}")
+    return key, [parse_value(v) for v in val.split(",")]
+
+def main():
+    ap = argparse.ArgumentParser(description="Partite headless in massa per tarare la difficolta'")
+    ap.add_argument("--seeds", type=int, default=2000, help="partite per configurazione")
+    ap.add_argument("--seed0", type=int, default=0, help="primo seed")
+    ap.add_argument("--policy", action="append", help=f"{', '.join(POLICIES)} o modulo:nome (ripetibile)")
+    ap.add_argument("--set", action="append", type=parse_assign, default=[],
+                    help="regola fissa a un valore solo, es. spawn_ms=480 (ogni chiave una volta)")
+    ap.add_argument("--sweep", action="append", type=parse_assign, default=[],
+                    help="regola da provare su piu' valori, es. hit_dx=65,75,85 (prodotto cartesiano)")
+    ap.add_argument("--max-time", type=float, default=600.0, help="secondi di gioco massimi per partita")
+    ap.add_argument("--procs", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--vectorized", action="store_true", help="ostacoli in obstacles_np")
+    ap.add_argument("--hist", type=float, nargs="?", const=10.0, help="istogramma sopravvivenza (bin in s)")
+    ap.add_argument("--save", help="scrive configurazioni e distribuzioni in JSON")
+    args = ap.parse_args()
+
+    policies = args.policy or ["dodger"]
+    for name in policies:
+        load_policy(name)  # errore subito, non dentro al pool
+    keys = [k for k, _ in args.set + args.sweep]
+    dup = sorted({k for k in keys if keys.count(k) > 1})
+    if dup:
+        ap.error(f"regola data piu' volte tra --set e --sweep: {', '.join(dup)}")
+    multi = [k for k, v in args.set if len(v) > 1]
+    if multi:
+        ap.error(f"--set vuole un valore solo ({', '.join(multi)}): per piu' valori c'e' --sweep")
+    fixed = {k: v[0] for k, v in args.set}
+    keys = [k for k, _ in args.sweep]
+    configs = [(policy, dict(fixed, **dict(zip(keys, combo))))
+               for policy in policies
+               for combo in itertools.product(*(v for _, v in args.sweep))]
+
+    seeds = range(args.seed0, args.seed0 + args.seeds)
+    max_ticks = int(args.max_time * sim.TICK_HZ)
+    t0 = time.perf_counter()
+    results = run(configs, seeds, max_ticks, args.procs, args.vectorized)
+    el = time.perf_counter() - t0
+
+    print(f"{len(configs) * len(seeds)} partite, {len(configs)} configurazioni, {args.procs} processi, {el:.1f}s\n")
+    print_report(results, args.hist)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"seeds": [args.seed0, args.seeds], "max_time": args.max_time, "defaults": sim.RULES,
+                       "results": results}, f, indent=1)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
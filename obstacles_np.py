@@ -0,0 +1,149 @@
+try:
+    import numpy as np
+except ImportError:  # numpy e' opzionale (es. build web senza wheel)
+    np = None
+
+import sim
+
+# =============================
+# OBSTACLE POOL (structure-of-arrays, NumPy)
+# =============================
+# Stessi risultati della lista di sim.Thing a parita' di seed: i numeri casuali
+# vengono estratti dallo stesso rng e nello stesso ordine, il resto e' batch.
+
+KIND_SUV, KIND_RAMP = 0, 1
+KIND_NAMES = ("suv", "ramp")
+
+AVAILABLE = np is not None
+
+class ObstaclePool:
+    FIELDS = ("d", "lane_x", "lane_v", "wobble_amp", "wobble_f", "wobble_p", "t_alive")
+
+    def __init__(self, capacity=64):
+        if np is None:
+            raise RuntimeError("ObstaclePool richiede numpy")
+        self.n = 0
+        self._view_version = None
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        old_n = self.n
+        for f in self.FIELDS:
+            a = np.zeros(capacity, dtype=np.float64)
+            if old_n:
+                a[:old_n] = getattr(self, f)[:old_n]
+            setattr(self, f, a)
+        kind = np.zeros(capacity, dtype=np.int8)
+        var = np.zeros(capacity, dtype=np.int8)
+        if old_n:
+            kind[:old_n] = self.kind[:old_n]
+            var[:old_n] = self.var[:old_n]
+        self.kind, self.var = kind, var
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.n
+
+    def add(self, th):
+        """Copia un sim.Thing appena creato (cosi' lo spawn consuma l'rng come la lista)."""
+        if self.n == self.capacity:
+            self._alloc(self.capacity * 2)
+        i = self.n
+        for f in self.FIELDS:
+            getattr(self, f)[i] = getattr(th, f)
+        self.kind[i] = KIND_RAMP if th.kind == "ramp" else KIND_SUV
+        self.var[i] = th.var
+        self.n += 1
+
+    def clear(self):
+        self.n = 0
+
+    def _compact(self, keep):
+        m = int(keep.sum())
+        if m == self.n:
+            return
+        for f in self.FIELDS + ("kind", "var"):
+            a = getattr(self, f)
+            a[:m] = a[:self.n][keep]
+        self.n = m
+
+    def update(self, dt, speed, rng):
+        n = self.n
+        if not n:
+            return
+        self.d[:n] -= speed * dt
+        self.t_alive[:n] += dt
+
+        suv = np.flatnonzero(self.kind[:n] == KIND_SUV)
+        if not len(suv):
+            return
+
+        # drift casuale: stesso ordine di estrazione di Thing.update
+        rand, uni = rng.random, rng.uniform
+        for i in suv.tolist():
+            if rand() < 0.015:
+                self.lane_v[i] = sim.clamp(self.lane_v[i] + uni(-0.10, 0.10), -0.20, 0.20)
+
+        lx = self.lane_x[suv]
+        lv = self.lane_v[suv]
+        lv += (-lx) * 0.06 * dt
+        lx += lv * dt
+        lx += np.sin(self.t_alive[suv] * self.wobble_f[suv] + self.wobble_p[suv]) * self.wobble_amp[suv] * dt
+        np.clip(lx, -0.95, 0.95, out=lx)
+        self.lane_v[suv] = lv
+        self.lane_x[suv] = lx
+
+    def _tables(self, view):
+        # copie numpy delle tabelle di perspective, rifatte solo se la vista cambia
+        if self._view_version != (id(view), view.version):
+            self._half_w = np.asarray(view.half_w, dtype=np.float64)
+            self._scale = np.asarray(view.sprite_scale, dtype=np.float64)
+            self._view_version = (id(view), view.version)
+        return self._half_w, self._scale
+
+    def screen_pos(self, idx=None, view=None):
+        """x, y (interi, come Thing.pos) e scala per gli ostacoli idx."""
+        view = view or sim.VIEW
+        half_w, scale = self._tables(view)
+        d = self.d[:self.n] if idx is None else self.d[idx]
+        lane_x = self.lane_x[:self.n] if idx is None else self.lane_x[idx]
+        t = np.clip(1.0 - d, 0.0, 1.0)
+        y = (view.depth_y0 + view.depth_span * t).astype(np.int64)
+        x = (view.cx + lane_x * half_w[y]).astype(np.int64)
+        return x, y, scale[y]
+
+    def collide(self, player, hit_dx=None):
+        """Ritorna (rampa_presa, suv_preso) e rimuove le rampe toccate."""
+        n = self.n
+        d = self.d[:n]
+        near = np.flatnonzero((d >= 0.0) & (d <= sim.HIT_BAND))
+        if not len(near):
+            return False, False
+        x, _, _ = self.screen_pos(near)
+        hit = near[np.abs(player.x() - x) < (sim.HIT_DX if hit_dx is None else hit_dx)]
+        if not len(hit):
+            return False, False
+
+        ramps = hit[self.kind[hit] == KIND_RAMP]
+        suv_hit = bool((self.kind[hit] == KIND_SUV).any())
+        if len(ramps):
+            keep = np.ones(n, dtype=bool)
+            keep[ramps] = False
+            self._compact(keep)
+        return bool(len(ramps)), suv_hit
+
+    def cull(self):
+        self._compact(self.d[:self.n] >= sim.DEAD_D)
+
+    def draw_list(self):
+        """(kind, var, d, lane_x) dal piu' lontano al piu' vicino."""
+        n = self.n
+        if not n:
+            return []
+        order = np.argsort(-self.d[:n], kind="stable")
+        return list(zip(
+            [KIND_NAMES[k] for k in self.kind[order].tolist()],
+            self.var[order].tolist(),
+            self.d[order].tolist(),
+            self.lane_x[order].tolist(),
+        ))
@@ -0,0 +1,76 @@
+# =============================
+# PERSPECTIVE (tabelle per scanline)
+# =============================
+# Tutta la geometria prospettica della strada, precalcolata per ogni riga
+# dello schermo. Le tabelle si ricostruiscono con resize() quando cambia la
+# risoluzione; chi ne deriva altro (es. array numpy) guarda `version`.
+# `scale` moltiplica le misure in pixel assoluti (lampioni, coni) quando si
+# disegna a una risoluzione diversa da quella logica della simulazione.
+
+def _clamp(x, a, b): return max(a, min(b, x))
+def _lerp(a, b, t): return a + (b - a) * t
+
+class Perspective:
+    def __init__(self, width, height, scale=1.0):
+        self.version = 0
+        self.resize(width, height, scale)
+
+    def resize(self, width, height, scale=1.0):
+        self.width, self.height = width, height
+        self.scale = scale
+        self.cx = width / 2
+
+        # Strada (versione buona)
+        self.horizon_y = int(height * 0.52)
+        self.bottom_y  = int(height * 0.985)
+        self.road_near_w = int(width * 1.32)
+        self.road_far_w  = int(width * 0.14)
+
+        self.player_y = int(height * 0.88)
+
+        # prima riga su cui si disegna (tratteggio, lampioni, ostacoli all'orizzonte)
+        self.road_top = self.horizon_y + int(10 * scale)
+
+        # profondita' d (1 = orizzonte, 0 = vicino) -> riga: lerp(road_top, 0.90 h, 1 - d)
+        self.depth_y0 = self.road_top
+        self.depth_span = height * 0.90 - self.depth_y0
+
+        span = self.bottom_y - self.horizon_y
+        far, near = self.road_far_w, self.road_near_w
+
+        self.row_t = []          # 0 all'orizzonte, 1 in fondo
+        self.half_w = []         # semi-larghezza strada
+        self.sprite_scale = []   # scala ostacoli (lerp(0.18, 1, t_profondita'))
+        self.lamp_inset = []
+        self.lamp_base_y = []
+        self.lamp_light = []     # fattore intensita' coni
+        self.cone_w = []
+        self.cone_h = []
+
+        for y in range(height + 1):
+            t = _clamp((y - self.horizon_y) / span, 0, 1)
+            t2 = t ** 0.60       # curva dei lampioni
+            self.row_t.append(t)
+            self.half_w.append((far + (near - far) * (t ** 0.55)) / 2)
+
+            td = _clamp((y - self.depth_y0) / self.depth_span, 0.0, 1.0)
+            self.sprite_scale.append(_lerp(0.18, 1.0, td))
+
+            self.lamp_inset.append(int(_lerp(6, 18, t2) * scale))
+            self.lamp_base_y.append(min(int(y + height * 0.15), int(self.bottom_y)))
+            self.lamp_light.append(_lerp(0.55, 1.05, t2))
+            self.cone_h.append(int(_lerp(140, 520, t2) * 1.30 * scale))
+            self.cone_w.append(int(_lerp(120, 520, t2) * 1.15 * scale))
+
+        self.version += 1
+
+    def depth_y(self, d):
+        return int(self.depth_y0 + self.depth_span * _clamp(1.0 - d, 0.0, 1.0))
+
+    def lane_to_x(self, lane_x, y):
+        return int(self.cx + lane_x * self.half_w[y])
+
+    def project(self, d, lane_x):
+        """(x, y, scala) sullo schermo per un oggetto a profondita' d."""
+        y = self.depth_y(d)
+        return int(self.cx + lane_x * self.half_w[y]), y, self.sprite_scale[y]
@@ -0,0 +1,249 @@
+import csv
+import gc
+import json
+import time
+from collections import deque
+
+import pygame
+
+# =============================
+# FRAME PROFILER
+# =============================
+# Tempo per stage di ogni frame (mark() chiude lo stage corrente), percentili
+# mobili p50/p95/p99, conteggio Surface create, chiamate pygame.transform e
+# collezioni del GC per frame (non gli altri oggetti Python creati), piu' i contatori registrati con watch() e i valori
+# per frame registrati con gauge() (es. latenza input).
+# Da spento ogni chiamata e' un solo `if`; i contatori si agganciano a pygame
+# e al GC solo quando il profiler e' acceso.
+
+WINDOW = 300          # frame per i percentili
+TRACE_MAX = 60 * 600  # frame tenuti per il dump (10 minuti a 60 FPS)
+TRANSFORMS = ("scale", "smoothscale", "rotate", "rotozoom", "flip")
+
+GRAPH_W, GRAPH_H = 240, 90
+GRAPH_MS = 33.3       # altezza del grafico in ms (due frame a 60 FPS)
+BAR_W = 2
+
+PALETTE = [
+    (80, 160, 255), (255, 170, 60), (120, 220, 120), (230, 90, 90),
+    (200, 120, 255), (255, 230, 90), (90, 220, 220), (250, 140, 200),
+    (170, 170, 170),
+]
+
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    k = (len(sorted_vals) - 1) * p
+    i = int(k)
+    j = min(i + 1, len(sorted_vals) - 1)
+    return sorted_vals[i] + (sorted_vals[j] - sorted_vals[i]) * (k - i)
+
+class FrameProfiler:
+    def __init__(self, window=WINDOW):
+        self.enabled = False
+        self.show = False
+        self.window = window
+        self.stages = []            # ordine di prima comparsa
+        self.samples = {}           # stage -> deque di ms
+        self.totals = deque(maxlen=window)
+        self.trace = deque(maxlen=TRACE_MAX)
+        self.frame = 0
+
+        self.surfaces = 0           # contatori del frame corrente
+        self.transforms = 0
+        self.gcs = 0
+        self._watch = {}            # nome -> fn() contatore cumulativo
+        self._watch_base = {}
+        self._gauge = {}            # nome -> fn() valore del frame
+        self._cur = {}
+        self._t = 0.0
+        self._t0 = 0.0
+        self._begun = False         # acceso a meta' frame (F3): si parte dal begin_frame dopo
+        self._orig = None
+
+        self._graph = None
+        self._legend = []
+        self._legend_frame = -1
+
+    # ---- on / off ----
+    def enable(self):
+        if not self.enabled:
+            self._install()
+            self.enabled = True
+
+    def disable(self):
+        if self.enabled:
+            self._uninstall()
+            self.enabled = False
+            self._begun = False
+
+    def toggle(self):
+        # F3: accende profiler e overlay insieme
+        if self.show:
+            self.show = False
+            self.disable()
+        else:
+            self.enable()
+            self.show = True
+
+    def watch(self, name, fn):
+        """fn() -> contatore cumulativo; a ogni frame si registra la differenza."""
+        self._watch[name] = fn
+
+    def gauge(self, name, fn):
+        """fn() -> valore del frame (None = niente), letto a fine frame cosi' com'e'."""
+        self._gauge[name] = fn
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self.gcs += 1
+
+    def _install(self):
+        prof = self
+        gc.callbacks.append(self._on_gc)
+        self._orig = {name: getattr(pygame.transform, name) for name in TRANSFORMS}
+        self._orig["Surface"] = base = pygame.Surface
+
+        def counting(fn):
+            def wrapper(*a, **k):
+                prof.transforms += 1
+                return fn(*a, **k)
+            return wrapper
+
+        class CountingSurface(base):
+            def __init__(self, *a, **k):
+                prof.surfaces += 1
+                base.__init__(self, *a, **k)
+
+        for name in TRANSFORMS:
+            setattr(pygame.transform, name, counting(self._orig[name]))
+        pygame.Surface = CountingSurface
+
+    def _uninstall(self):
+        gc.callbacks.remove(self._on_gc)
+        pygame.Surface = self._orig.pop("Surface")
+        for name, fn in self._orig.items():
+            setattr(pygame.transform, name, fn)
+        self._orig = None
+
+    # ---- per frame ----
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._begun = True
+        self._t = self._t0 = time.perf_counter()
+        self._cur = {}
+        self.surfaces = self.transforms = self.gcs = 0
+        for name, fn in self._watch.items():
+            self._watch_base[name] = fn()
+
+    def mark(self, stage):
+        """Chiude lo stage: tutto il tempo dall'ultimo mark va a `stage`."""
+        if not self._begun:
+            return
+        now = time.perf_counter()
+        self._cur[stage] = self._cur.get(stage, 0.0) + (now - self._t) * 1000.0
+        self._t = now
+
+    def end_frame(self):
+        if not self._begun:
+            return
+        self._begun = False
+        total = (time.perf_counter() - self._t0) * 1000.0
+        for stage, ms in self._cur.items():
+            if stage not in self.samples:
+                self.stages.append(stage)
+                self.samples[stage] = deque(maxlen=self.window)
+            self.samples[stage].append(ms)
+        self.totals.append(total)
+        counts = {"surfaces": self.surfaces, "transforms": self.transforms, "gc": self.gcs}
+        for name, fn in self._watch.items():
+            counts[name] = fn() - self._watch_base[name]
+        for name, fn in self._gauge.items():
+            counts[name] = fn()
+        self.trace.append((self.frame, total, dict(self._cur), counts))
+        self.frame += 1
+        if self.show:
+            self._push_graph()
+
+    # ---- statistiche ----
+    def percentiles(self, stage=None):
+        vals = sorted(self.totals if stage is None else self.samples.get(stage, ()))
+        return tuple(percentile(vals, p) for p in (0.50, 0.95, 0.99))
+
+    def summary(self):
+        out = {"frames": self.frame, "total": dict(zip(("p50", "p95", "p99"), self.percentiles()))}
+        for stage in self.stages:
+            out[stage] = dict(zip(("p50", "p95", "p99"), self.percentiles(stage)))
+        return out
+
+    def dump(self, path):
+        """Scrive la traccia: .json (frame + riepilogo) oppure CSV per tutto il resto."""
+        if path.endswith(".json"):
+            frames = [dict(counts, frame=f, total_ms=t, stages=st) for f, t, st, counts in self.trace]
+            with open(path, "w") as fp:
+                json.dump({"summary": self.summary(), "frames": frames}, fp, indent=1)
+            return
+        names = list(self.trace[-1][3]) if self.trace else []
+        with open(path, "w", newline="") as fp:
+            w = csv.writer(fp)
+            w.writerow(["frame", "total_ms"] + self.stages + names)
+            for f, t, st, counts in self.trace:
+                w.writerow([f, f"{t:.3f}"] + [f"{st.get(k, 0.0):.3f}" for k in self.stages]
+                           + [counts.get(k, 0) for k in names])
+
+    # ---- overlay ----
+    def _push_graph(self):
+        # il grafico scorre: a ogni frame si disegna solo la colonna nuova
+        if self._graph is None:
+            self._graph = pygame.Surface((GRAPH_W, GRAPH_H), pygame.SRCALPHA)
+            self._graph.fill((0, 0, 0, 150))
+        g = self._graph
+        g.scroll(-BAR_W, 0)
+        g.fill((0, 0, 0, 150), (GRAPH_W - BAR_W, 0, BAR_W, GRAPH_H))
+
+        y = GRAPH_H
+        k = GRAPH_H / GRAPH_MS
+        for i, stage in enumerate(self.stages):
+            h = int(self._cur.get(stage, 0.0) * k + 0.5)
+            if h <= 0:
+                continue
+            y -= h
+            g.fill(PALETTE[i % len(PALETTE)], (GRAPH_W - BAR_W, max(0, y), BAR_W, h))
+        ref = GRAPH_H - int(16.7 * k)
+        g.fill((255, 255, 255, 120), (GRAPH_W - BAR_W, ref, BAR_W, 1))
+
+    def draw(self, surf, draw_text, x, y, line_h=18):
+        """Grafico + legenda; draw_text(surf, txt, x, y, color=...) come in main.
+        Il grafico e' sempre GRAPH_W x GRAPH_H, line_h segue il font della legenda."""
+        if not (self.enabled and self.show) or self._graph is None:
+            return
+        surf.blit(self._graph, (x, y))
+
+        # le righe di testo cambiano solo due volte al secondo
+        if self.frame - self._legend_frame >= 30:
+            self._legend_frame = self.frame
+            p50, p95, p99 = self.percentiles()
+            self._legend = [
+                ("ms: p50 p95 p99", (200, 200, 200)),
+                (f"frame {p50:5.2f} {p95:5.2f} {p99:5.2f}", (255, 255, 255)),
+            ]
+            for i, stage in enumerate(self.stages):
+                a, b, c = self.percentiles(stage)
+                self._legend.append((f"{stage:<8} {a:5.2f} {b:5.2f} {c:5.2f}", PALETTE[i % len(PALETTE)]))
+            # contatori dell'ultimo frame: Surface nuove, transform, run del GC e watch
+            # (a regime 0). Non e' un conteggio degli oggetti Python: le tuple, i Rect e
+            # le liste di ogni frame non ci sono, finche' non fanno partire il GC
+            counts = self.trace[-1][3] if self.trace else {}
+            if counts:
+                self._legend.append(("nuovi nel frame (Surface, GC):", (200, 200, 200)))
+            short = {"surfaces": "surf", "transforms": "xform"}
+            items = [f"{short.get(k, k)} {v:.1f}" if isinstance(v, float) else f"{short.get(k, k)} {v}"
+                     for k, v in counts.items() if v is not None]
+            for i in range(0, len(items), 2):
+                self._legend.append(("  ".join(items[i:i + 2]), (200, 200, 200)))
+
+        ly = y + GRAPH_H + 4
+        for txt, color in self._legend:
+            draw_text(surf, txt, x, ly, color=color)
+            ly += line_h
@@ -0,0 +1,89 @@
+from collections import deque
+
+# =============================
+# QUALITA' ADATTIVA
+# =============================
+# Guarda il tempo di lavoro dei frame (senza l'attesa di clock.tick) e scende di
+# un livello quando il p90 della finestra sfora il budget del frame; risale solo
+# dopo un periodo con parecchio margine. Ogni risalita fallita raddoppia l'attesa
+# prima di riprovare, cosi' non oscilla tra due livelli.
+
+TIERS = (
+    # lamp_step: distanza tra lampioni (px logici); cone_scale: 0 = niente coni;
+    # render_scale: frazione della risoluzione interna (il cambio ricuoce gli sprite)
+    {"name": "high",   "lamp_step": 140, "cone_scale": 1.00, "render_scale": 1.00},
+    {"name": "medium", "lamp_step": 140, "cone_scale": 0.80, "render_scale": 1.00},
+    {"name": "low",    "lamp_step": 210, "cone_scale": 0.80, "render_scale": 1.00},
+    {"name": "lowest", "lamp_step": 280, "cone_scale": 0.00, "render_scale": 0.75},
+)
+
+WINDOW = 60            # frame per decisione
+DOWN_AT = 0.90         # p90 oltre il 90% del budget -> giu'
+UP_AT = 0.55           # p90 sotto il 55% per UP_WINDOWS finestre di fila -> su
+UP_WINDOWS = 5
+RETRY_WINDOWS = 10     # attesa minima dopo una discesa, raddoppia se la risalita non regge
+
+class QualityController:
+    def __init__(self, fps=60, tiers=TIERS, window=WINDOW):
+        self.tiers = tiers
+        self.budget_ms = 1000.0 / fps
+        self.window = window
+        self.tier = 0
+        self.pinned = False
+        self.changes = 0
+        self._ms = deque(maxlen=window)
+        self._n = 0
+        self._good = 0
+        self._cooldown = 0
+        self._retry = RETRY_WINDOWS
+        self._just_up = False
+
+    @property
+    def settings(self):
+        return self.tiers[self.tier]
+
+    @property
+    def name(self):
+        return self.tiers[self.tier]["name"]
+
+    def pin(self, name):
+        """Livello fisso (es. per catture riproducibili); None torna adattivo."""
+        self.pinned = name is not None
+        if name is not None:
+            self.tier = [t["name"] for t in self.tiers].index(name)
+
+    def frame(self, work_ms):
+        """Da chiamare a ogni frame; True se il livello e' cambiato."""
+        self._ms.append(work_ms)
+        self._n += 1
+        if self.pinned or self._n < self.window:
+            return False
+        self._n = 0
+
+        p90 = sorted(self._ms)[int(len(self._ms) * 0.9)]
+        if self._cooldown:
+            self._cooldown -= 1
+
+        if p90 > self.budget_ms * DOWN_AT and self.tier < len(self.tiers) - 1:
+            # appena risaliti e gia' troppo lenti: la prossima risalita aspetta il doppio
+            self._retry = self._retry * 2 if self._just_up else RETRY_WINDOWS
+            self._cooldown = self._retry
+            self._good = 0
+            return self._set(self.tier + 1, up=False)
+
+        self._just_up = False
+        if p90 < self.budget_ms * UP_AT and self.tier > 0:
+            self._good += 1
+            if self._good >= UP_WINDOWS and not self._cooldown:
+                self._good = 0
+                return self._set(self.tier - 1, up=True)
+        else:
+            self._good = 0
+        return False
+
+    def _set(self, tier, up):
+        self.tier = tier
+        self._just_up = up
+        self._ms.clear()
+        self.changes += 1
+        return True
@@ -0,0 +1,180 @@
+import sys
+import pygame
+from collections import OrderedDict
+
+# =============================
+# LAYERED RENDERER (+ dirty rects)
+# =============================
+# Livelli:
+#   statico  -> sfondo + corpo strada, in cache per fascia di notte
+#   world    -> tratteggio, lampioni, ostacoli, player (sotto l'overlay notte)
+#   overlay  -> velo nero pre-cotto, alpha per fascia
+#   ui       -> HUD, pulsanti, testi
+# Solo i livelli mobili vengono ricomposti; se la fascia di notte non cambia
+# si ridisegnano e si aggiornano solo i rettangoli sporchi.
+
+NIGHT_BUCKETS = 16
+STATIC_CACHE = 4          # superfici full-screen tenute in cache (LRU)
+FULL_REDRAW_AREA = 0.75   # oltre questa frazione di schermo sporca conviene un flip
+MAX_DIRTY_RECTS = 40      # oltre, calcolare i pezzi disgiunti costa piu' del flip
+
+# display.update(rects) non porta vantaggi sul canvas del browser
+DIRTY_RECTS_SUPPORTED = sys.platform != "emscripten"
+
+def display_flip(rects):
+    if rects is None:
+        pygame.display.flip()
+    else:
+        pygame.display.update(rects)
+
+def night_bucket(night, buckets=NIGHT_BUCKETS):
+    return int(max(0.0, min(1.0, night)) * (buckets - 1) + 0.5)
+
+def _subtract(p, o):
+    # parti di p fuori da o (p e o si sovrappongono)
+    i = p.clip(o)
+    out = []
+    if i.top > p.top:
+        out.append(pygame.Rect(p.left, p.top, p.w, i.top - p.top))
+    if p.bottom > i.bottom:
+        out.append(pygame.Rect(p.left, i.bottom, p.w, p.bottom - i.bottom))
+    if i.left > p.left:
+        out.append(pygame.Rect(p.left, i.top, i.left - p.left, i.h))
+    if p.right > i.right:
+        out.append(pygame.Rect(i.right, i.top, p.right - i.right, i.h))
+    return out
+
+def disjoint_rects(rects, bounds):
+    """Copre l'unione dei rettangoli con pezzi disgiunti (l'overlay non va applicato due volte)."""
+    out = []
+    for r in rects:
+        r = r.clip(bounds)
+        if not r.w or not r.h:
+            continue
+        pieces = [r]
+        for o in out:
+            nxt = []
+            for p in pieces:
+                if p.colliderect(o):
+                    nxt.extend(_subtract(p, o))
+                else:
+                    nxt.append(p)
+            pieces = nxt
+            if not pieces:
+                break
+        out.extend(pieces)
+    return out
+
+class BlitQueue:
+    """Finta superficie: registra i blit invece di eseguirli."""
+
+    def __init__(self):
+        self.items = []
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        if area is not None or special_flags:
+            raise ValueError("BlitQueue supporta solo blit semplici")
+        if isinstance(dest, pygame.Rect):
+            r = pygame.Rect(dest.topleft, source.get_size())
+        else:
+            r = pygame.Rect(dest[0], dest[1], *source.get_size())
+        self.items.append((source, r))
+        return r
+
+    def blits(self, seq, doreturn=False):
+        """Come Surface.blits, ma dest deve essere gia' un Rect della misura della sorgente."""
+        self.items.extend(seq)
+
+    def clear(self):
+        self.items.clear()
+
+class LayeredRenderer:
+    def __init__(self, screen, build_static, overlay_alpha, dirty=True, buckets=NIGHT_BUCKETS, flip=None):
+        """build_static(night) -> Surface full-screen; overlay_alpha(night) -> 0..255.
+        flip(rects) mostra il frame (rects None = tutto); di default e' il display stesso."""
+        self.build_static = build_static
+        self.overlay_alpha = overlay_alpha
+        self.dirty = dirty and DIRTY_RECTS_SUPPORTED
+        self.buckets = buckets
+        self.flip = flip or display_flip
+
+        self.world = BlitQueue()
+        self.ui = BlitQueue()
+
+        self._static = OrderedDict()
+        self._bucket = None
+        self._prev_rects = []
+        self._valid = False
+        self.set_target(screen)
+
+        self.full_frames = 0
+        self.dirty_frames = 0
+
+    def set_target(self, screen):
+        """Nuova superficie di destinazione (cambio risoluzione): layer e overlay si rifanno."""
+        self.screen = screen
+        self._overlay = pygame.Surface(screen.get_size())
+        self._overlay.fill((0, 0, 0))
+        self._prev_rects = []
+        self.invalidate(static=True)
+
+    def invalidate(self, static=False):
+        """Prossimo frame completo; static=True butta anche i layer statici (es. sfondo cambiato)."""
+        if static:
+            self._static.clear()
+        self._valid = False
+
+    def static_layer(self, bucket):
+        s = self._static.get(bucket)
+        if s is None:
+            s = self.build_static(bucket / (self.buckets - 1))
+            self._static[bucket] = s
+            while len(self._static) > STATIC_CACHE:
+                self._static.popitem(last=False)
+        else:
+            self._static.move_to_end(bucket)
+        return s
+
+    def begin(self, night):
+        self.world.clear()
+        self.ui.clear()
+        bucket = night_bucket(night, self.buckets)
+        if bucket != self._bucket:
+            self._valid = False
+        self._bucket = bucket
+
+    def present(self):
+        screen = self.screen
+        bounds = screen.get_rect()
+        static = self.static_layer(self._bucket)
+        alpha = self.overlay_alpha(self._bucket / (self.buckets - 1))
+        self._overlay.set_alpha(alpha)
+
+        cur = [r for _, r in self.world.items] + [r for _, r in self.ui.items]
+        dirty = None
+        if self._valid and self.dirty and len(self._prev_rects) + len(cur) <= MAX_DIRTY_RECTS:
+            dirty = disjoint_rects(self._prev_rects + cur, bounds)
+            if sum(r.w * r.h for r in dirty) > FULL_REDRAW_AREA * bounds.w * bounds.h:
+                dirty = None
+
+        if dirty is None:
+            screen.blit(static, (0, 0))
+            screen.blits(self.world.items, doreturn=False)
+            if alpha > 0:
+                screen.blit(self._overlay, (0, 0))
+            screen.blits(self.ui.items, doreturn=False)
+            self.flip(None)
+            self.full_frames += 1
+        else:
+            for r in dirty:
+                screen.blit(static, r, r)
+            screen.blits(self.world.items, doreturn=False)
+            if alpha > 0:
+                for r in dirty:
+                    screen.blit(self._overlay, r, r)
+            screen.blits(self.ui.items, doreturn=False)
+            self.flip(dirty)
+            self.dirty_frames += 1
+
+        self._prev_rects = cur
+        self._valid = True
@@ -0,0 +1,128 @@
+import argparse
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import namedtuple
+
+import sim
+
+# =============================
+# REPLAY
+# =============================
+# File .rpl: header fisso + input per tick compressi con zlib.
+#   header: magic, versione, tick_hz, player_w, seed, n tick, tick game over, score finale
+#   tick:   1 byte -> bit 0-1 sterzo (0 fermo, 1 sinistra, 2 destra), bit 2 salto, bit 3 restart
+# Lo sterzo e' digitale (tastiera / zone touch), quindi basta il segno.
+
+MAGIC = b"RDRP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHQIid")
+
+STEER_LEFT, STEER_RIGHT = 1, 2
+JUMP_BIT, RESTART_BIT = 4, 8
+
+Replay = namedtuple("Replay", "seed player_w tick_hz inputs over_tick score")
+
+def pack_input(inputs):
+    b = 0
+    if inputs.steer < 0:
+        b = STEER_LEFT
+    elif inputs.steer > 0:
+        b = STEER_RIGHT
+    if inputs.jump:
+        b |= JUMP_BIT
+    if inputs.restart:
+        b |= RESTART_BIT
+    return b
+
+# tutte le 16 combinazioni pre-costruite: la decodifica e' un lookup
+_UNPACKED = [
+    sim.Inputs(
+        -1.0 if b & 3 == STEER_LEFT else (1.0 if b & 3 == STEER_RIGHT else 0.0),
+        bool(b & JUMP_BIT),
+        bool(b & RESTART_BIT),
+    )
+    for b in range(16)
+]
+
+def unpack_input(b):
+    return _UNPACKED[b & 15]
+
+class Recorder:
+    def __init__(self, state):
+        self.seed = state["seed"]
+        self.player_w = state["player_w"]
+        self.ticks = bytearray()
+
+    def record(self, inputs):
+        self.ticks.append(pack_input(inputs))
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def to_bytes(self, state):
+        over_tick = state["over_tick"] if state["over_tick"] is not None else -1
+        header = HEADER.pack(MAGIC, VERSION, sim.TICK_HZ, self.player_w, self.seed,
+                             len(self.ticks), over_tick, state["score"])
+        return header + zlib.compress(bytes(self.ticks), 9)
+
+    def save(self, path, state):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.to_bytes(state))
+        os.replace(tmp, path)
+
+def from_bytes(data):
+    magic, version, tick_hz, player_w, seed, n, over_tick, score = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("non e' un file replay")
+    if version != VERSION:
+        raise ValueError(f"versione replay {version} non supportata")
+    ticks = zlib.decompress(data[HEADER.size:])
+    if len(ticks) != n:
+        raise ValueError(f"replay troncato: {len(ticks)} tick su {n}")
+    return Replay(seed, player_w, tick_hz, ticks, None if over_tick < 0 else over_tick, score)
+
+def load(path):
+    with open(path, "rb") as f:
+        return from_bytes(f.read())
+
+def resimulate(replay, vectorized=False):
+    """Rigioca tutti i tick registrati il piu' veloce possibile e ritorna lo stato finale."""
+    if replay.tick_hz != sim.TICK_HZ:
+        raise ValueError(f"replay a {replay.tick_hz} Hz, la simulazione gira a {sim.TICK_HZ} Hz")
+    state = sim.new_state(replay.seed, player_w=replay.player_w, vectorized=vectorized)
+    step, dt = sim.step, sim.DT
+    for b in replay.inputs:
+        step(state, dt, _UNPACKED[b & 15])
+    return state
+
+def verify(replay, vectorized=False):
+    """(ok, stato) confrontando score finale e tick di game over con quelli registrati."""
+    state = resimulate(replay, vectorized)
+    ok = state["score"] == replay.score and state["over_tick"] == replay.over_tick
+    return ok, state
+
+def main():
+    ap = argparse.ArgumentParser(description="Verifica/rigioca replay headless")
+    ap.add_argument("files", nargs="+")
+    ap.add_argument("--vectorized", action="store_true", help="usa il pool numpy degli ostacoli")
+    args = ap.parse_args()
+
+    failed = 0
+    for path in args.files:
+        rp = load(path)
+        t0 = time.perf_counter()
+        ok, state = verify(rp, args.vectorized)
+        el = time.perf_counter() - t0
+        failed += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {path}: seed={rp.seed} ticks={len(rp.inputs)} "
+              f"score={state['score']:.1f} (atteso {rp.score:.1f}) "
+              f"over_tick={state['over_tick']} (atteso {rp.over_tick}) "
+              f"{len(rp.inputs) / max(el, 1e-9):.0f} tick/s")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
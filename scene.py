@@ -0,0 +1,107 @@
+import json
+import random
+
+import sim
+
+# =============================
+# SCENE (tempo e scena pilotati)
+# =============================
+# Per catture di performance ripetibili: il gioco legge il tempo da un GameClock
+# (congelabile, accelerabile, a passo fisso) e una scena scriptata puo' fissare
+# notte, ostacoli, seed, regole e livello di qualita' a frame precisi.
+#
+#   RIDERS_SCENE=worst                  preset (vedi PRESETS)
+#   RIDERS_SCENE=capture.json           script: un dict (applicato al frame 0)
+#                                       o una lista di passi {"frame": n, ...}
+#
+# Chiavi di un passo:
+#   time_ms, rate (0 = fermo), fixed_dt (true: ogni frame avanza di 1/FPS),
+#   night (0..1, null = ciclo normale), quality (nome livello, null = adattiva),
+#   obstacles (numero, o lista [kind, var, d, lane_x]), seed, rules (sim.RULES),
+#   steer_vis, quit (true: esce a questo frame, prima di disegnarlo).
+# Un dict con "frames": n esce da solo dopo n frame.
+
+PRESETS = {
+    # caso peggiore: meta' dissolvenza (coni + overlay), lampioni fitti, 50 ostacoli, tutto fermo
+    "worst": {"time_ms": 12345, "rate": 0.0, "night": 0.5, "quality": "high", "obstacles": 50, "seed": 1},
+    "night": {"time_ms": 12345, "rate": 0.0, "night": 1.0, "quality": "high", "obstacles": 50, "seed": 1},
+    "day": {"time_ms": 12345, "rate": 0.0, "night": 0.0, "quality": "high", "obstacles": 50, "seed": 1},
+    # gioco che scorre a passo fisso, senza spawn ne' collisioni: stessi frame a ogni run
+    "rush": {"time_ms": 0, "rate": 1.0, "fixed_dt": True, "night": 1.0, "obstacles": 200, "seed": 1,
+             "rules": {"spawn_ms": 1e12, "hit_dx": 0}, "frames": 600},
+}
+
+STATE_KEYS = ("obstacles", "seed", "rules", "steer_vis")
+
+class GameClock:
+    """Millisecondi di gioco: avanzano col tempo reale * rate, o di fixed_ms a ogni tick."""
+    def __init__(self, rate=1.0, fixed_ms=None):
+        self.ms = 0.0
+        self.rate = rate
+        self.fixed_ms = fixed_ms
+
+    def tick(self, real_ms):
+        """Chiamare una volta per frame col tempo reale trascorso; ritorna i ms di gioco."""
+        d = (real_ms if self.fixed_ms is None else self.fixed_ms) * self.rate
+        self.ms += d
+        return d
+
+    @property
+    def now(self):
+        return int(self.ms)
+
+def scene_state(obstacles, seed=1, player_w=sim.PLAYER_W, vectorized=False, rules=None, steer_vis=0.6):
+    """Stato con ostacoli messi a mano: un numero (sparsi su tutta la profondita') o una lista.
+    I Thing vengono da sim.POOL, come allo spawn: quando spariscono ci tornano."""
+    state = sim.new_state(seed, player_w=player_w, vectorized=vectorized, rules=rules)
+    if isinstance(obstacles, int):
+        rng = random.Random(seed)
+        n = obstacles
+        for i in range(n):
+            th = sim.POOL.take("ramp" if rng.random() < sim.RAMP_CHANCE else "suv", state["rng"])
+            th.d = 1.1 * (i + 0.5) / n
+            _add(state, th)
+    else:
+        # dal piu' lontano: l'ordine di spawn resta quello di un gioco vero
+        for kind, var, d, lane_x in sorted(obstacles, key=lambda o: -o[2]):
+            th = sim.POOL.take(kind, state["rng"])
+            th.var, th.d, th.lane_x = var, d, lane_x
+            _add(state, th)
+    state["player"].steer_vis = steer_vis
+    return state
+
+def _add(state, th):
+    state["things"].add(th)
+    if state["vectorized"]:
+        sim.POOL.give(th)  # il pool numpy ne copia i campi
+
+class Scene:
+    def __init__(self, steps):
+        self.steps = {}
+        for step in steps:
+            step = dict(step)
+            self.steps.setdefault(step.pop("frame", 0), []).append(step)
+
+    def due(self, frame):
+        """Passi da applicare a questo frame (di solito nessuno)."""
+        return self.steps.get(frame, ())
+
+    def wants_state(self, step):
+        return any(k in step for k in STATE_KEYS)
+
+def load(spec):
+    """Nome di preset o path di uno script JSON."""
+    if spec in PRESETS:
+        script = PRESETS[spec]
+    else:
+        with open(spec) as f:
+            script = json.load(f)
+    if isinstance(script, dict):
+        script = dict(script)
+        steps = [script]
+        frames = script.pop("frames", None)
+        if frames:
+            steps.append({"frame": frames, "quit": True})
+    else:
+        steps = script
+    return Scene(steps)
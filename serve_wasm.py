@@ -1,35 +1,469 @@
 import argparse
+import gzip
+import hashlib
 import http.server
+import json
 import socketserver
 import mimetypes
 import os
+import re
+import stat
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from email.utils import formatdate
+
+try:
+    import brotli  # opzionale: senza, solo varianti gzip
+except ImportError:
+    brotli = None
+
+# estensione -> MIME, calcolata una volta: guess_type e' un lookup
+MIME_TYPES = dict(mimetypes.types_map)
+MIME_TYPES.update({
+    ".wasm": "application/wasm",
+    ".data": "application/octet-stream",
+    ".js": "application/javascript",
+    ".css": "text/css",
+})
+DEFAULT_MIME = "application/octet-stream"
+
+# =============================
+# METRICHE
+# =============================
+# GET /__metrics -> JSON con richieste, byte e istogramma delle latenze per tipo di file
+# (estensione del path richiesto), utile durante i load test.
+
+METRICS_PATH = "/__metrics"
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._types = {}
+
+    def record(self, kind, status, nbytes, ms):
+        with self._lock:
+            m = self._types.get(kind)
+            if m is None:
+                m = self._types[kind] = {
+                    "requests": 0, "bytes": 0, "status": {}, "sum_ms": 0.0, "max_ms": 0.0,
+                    "hist": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+            m["requests"] += 1
+            m["bytes"] += nbytes
+            m["status"][status] = m["status"].get(status, 0) + 1
+            m["sum_ms"] += ms
+            m["max_ms"] = max(m["max_ms"], ms)
+            m["hist"][bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+
+    def snapshot(self):
+        labels = [f"<={b}" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+        with self._lock:
+            by_type = {
+                kind: {
+                    "requests": m["requests"],
+                    "bytes": m["bytes"],
+                    "status": {str(k): v for k, v in sorted(m["status"].items())},
+                    "mean_ms": m["sum_ms"] / m["requests"],
+                    "max_ms": m["max_ms"],
+                    "latency_ms": dict(zip(labels, m["hist"])),
+                }
+                for kind, m in sorted(self._types.items())
+            }
+        uptime = time.time() - self.started
+        requests = sum(m["requests"] for m in by_type.values())
+        return {
+            "uptime_s": uptime,
+            "requests": requests,
+            "bytes": sum(m["bytes"] for m in by_type.values()),
+            "requests_per_s": requests / uptime if uptime > 0 else 0.0,
+            "by_type": by_type,
+        }
 
 class Handler(http.server.SimpleHTTPRequestHandler):
+    metrics = Metrics()
+
     def guess_type(self, path):
-        base, ext = os.path.splitext(path)
-        if ext == ".wasm":
-            return "application/wasm"
-        if ext == ".data":
-            return "application/octet-stream"
-        if ext == ".js":
-            return "application/javascript"
-        if ext == ".css":
-            return "text/css"
-        return mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return MIME_TYPES.get(os.path.splitext(path)[1].lower(), DEFAULT_MIME)
 
     def end_headers(self):
         # utile per evitare cache strana durante i test
         self.send_header("Cache-Control", "no-store")
         super().end_headers()
 
+    def handle_one_request(self):
+        self._t0 = None
+        self._status = None
+        self._sent = 0
+        super().handle_one_request()
+        if self._status is not None:  # None: connessione chiusa senza richiesta (keep-alive scaduto)
+            now = time.perf_counter()
+            t0 = self._t0 if self._t0 is not None else now  # request line troppo lunga: mai parsata
+            self.metrics.record(self.kind(), self._status, self._sent, (now - t0) * 1000.0)
+
+    def parse_request(self):
+        # il tempo parte dalla richiesta letta: l'attesa in keep-alive tra due richieste non conta
+        ok = super().parse_request()
+        self._t0 = time.perf_counter()
+        return ok
+
+    def kind(self):
+        """Etichetta delle metriche: solo estensioni note, il path lo sceglie il client."""
+        path = getattr(self, "path", "")  # manca se la request line era malformata
+        if path == METRICS_PATH:
+            return "metrics"
+        ext = os.path.splitext(path.split("?", 1)[0])[1].lower()
+        if not ext:
+            return "dir"
+        return ext.lstrip(".") if ext in MIME_TYPES else "other"
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def do_GET(self):
+        if not self.send_metrics():
+            super().do_GET()
+
+    def send_metrics(self):
+        if self.path != METRICS_PATH:
+            return False
+        body = json.dumps(self.metrics.snapshot(), indent=1).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self._sent += len(body)
+        return True
+
+    def copyfile(self, source, outputfile):
+        # zero-copy: il kernel manda il file direttamente sul socket (os.sendfile);
+        # per gli oggetti senza fileno (listing delle directory) socket.sendfile ripiega su send
+        self._sent += self.connection.sendfile(source)
+
+# =============================
+# PRODUZIONE
+# =============================
+# python serve_wasm.py --dir build/web --production --precompress --host 0.0.0.0
+# - un thread per connessione, keep-alive (HTTP/1.1)
+# - varianti .br / .gz accanto ai file (--precompress le genera), scelte con Accept-Encoding
+# - ETag forti (hash del contenuto servito): i file con l'hash nel nome (web-cache di
+#   pygbag) sono immutable per un anno, il resto si rivalida con If-None-Match
+# - Range (una sola per richiesta) e If-Range
+# - cache in memoria dei file caldi, LRU con budget; i file grossi restano su disco
+
+COMPRESSIBLE = {".html", ".js", ".css", ".json", ".wasm", ".data", ".txt", ".tmpl", ".py", ".svg"}
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))   # ordine di preferenza
+MIN_SAVING = 0.90        # la variante compressa si tiene solo sotto il 90% dell'originale
+
+HASHED_NAME = re.compile(r"(^|[.\-_])[0-9a-f]{16,}([.\-_]|$)")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+HOT_CACHE_BYTES = 64 * 1024 * 1024
+HOT_FILE_MAX = 8 * 1024 * 1024
+CHUNK = 256 * 1024  # lettura a pezzi per l'hash dei file grossi
+
+def precompress(root):
+    """Scrive accanto ai file comprimibili le varianti .gz (e .br se c'e' brotli); ritorna quante."""
+    written = 0
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            if os.path.splitext(name)[1] not in COMPRESSIBLE:
+                continue
+            src = os.path.join(dirpath, name)
+            mtime = os.stat(src).st_mtime_ns
+            data = None
+            for coding, suffix in ENCODINGS:
+                dst = src + suffix
+                if coding == "br" and brotli is None:
+                    continue
+                if os.path.exists(dst) and os.stat(dst).st_mtime_ns >= mtime:
+                    continue
+                if data is None:
+                    with open(src, "rb") as f:
+                        data = f.read()
+                packed = brotli.compress(data, quality=11) if coding == "br" else gzip.compress(data, 9, mtime=0)
+                if len(packed) >= len(data) * MIN_SAVING:
+                    continue
+                with open(dst + ".tmp", "wb") as f:
+                    f.write(packed)
+                os.replace(dst + ".tmp", dst)
+                written += 1
+    return written
+
+def accepted_encodings(header):
+    """Codifiche con q > 0 dall'header Accept-Encoding."""
+    out = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            out.add(coding.strip().lower())
+    if "*" in out:
+        out.update(c for c, _ in ENCODINGS)
+    return out
+
+def parse_range(header, size):
+    """(start, end) inclusivi; None se non soddisfacibile; False se da ignorare (servire tutto)."""
+    if not header.startswith("bytes=") or "," in header:
+        return False
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if first == "":
+            n = int(last)
+            if n <= 0:
+                return None
+            return max(0, size - n), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return False
+    if last and end < start:
+        return False  # sintatticamente invalido (es. 5-3): RFC 9110 dice di ignorarlo
+    if start >= size:
+        return None
+    return start, min(end, size - 1)
+
+INDEX_TTL = 1.0  # s: ogni file si ri-stat-a al massimo una volta per intervallo
+
+class StatIndex:
+    """path -> stat del file servito, riletto dopo INDEX_TTL secondi.
+    I path che non esistono non si tengono: li puo' chiedere chiunque, all'infinito."""
+
+    def __init__(self, ttl=INDEX_TTL):
+        self.ttl = ttl
+        self._d = {}
+
+    def scan(self, root):
+        now = time.monotonic()
+        for dirpath, dirs, files in os.walk(root):
+            for name in dirs + files:
+                path = os.path.join(dirpath, name)
+                try:
+                    self._d[path] = (os.stat(path), now)
+                except OSError:
+                    pass
+        return len(self._d)
+
+    def stat(self, path):
+        e = self._d.get(path)
+        now = time.monotonic()
+        if e is None or now - e[1] >= self.ttl:
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._d.pop(path, None)
+                raise FileNotFoundError(path) from None
+            e = self._d[path] = (st, now)
+        return e[0]
+
+    def isdir(self, path):
+        try:
+            return stat.S_ISDIR(self.stat(path).st_mode)
+        except OSError:
+            return False
+
+class Variant:
+    __slots__ = ("path", "size", "mtime_ns", "etag", "data")
+
+    def __init__(self, path, st, data, etag):
+        self.path = path
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.etag = etag
+        self.data = data
+
+class FileCache:
+    """path -> Variant; il contenuto resta in memoria solo per i file <= max_file, nel budget."""
+
+    def __init__(self, budget=HOT_CACHE_BYTES, max_file=HOT_FILE_MAX):
+        self.budget = budget
+        self.max_file = max_file
+        self.bytes = 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, st):
+        with self._lock:
+            v = self._lru.get(path)
+            if v is not None and v.size == st.st_size and v.mtime_ns == st.st_mtime_ns:
+                self._lru.move_to_end(path)
+                return v
+
+        # fuori dal lock: leggere/hashare un file grosso non blocca gli altri thread
+        h = hashlib.sha1()
+        data = None
+        with open(path, "rb") as f:
+            if st.st_size <= self.max_file:
+                data = f.read()
+                h.update(data)
+            else:
+                for chunk in iter(lambda: f.read(CHUNK), b""):
+                    h.update(chunk)
+        v = Variant(path, st, data, f'"{h.hexdigest()[:24]}"')
+
+        with self._lock:
+            old = self._lru.pop(path, None)
+            if old is not None and old.data is not None:
+                self.bytes -= len(old.data)
+            self._lru[path] = v
+            if data is not None:
+                self.bytes += len(data)
+            while self.bytes > self.budget and len(self._lru) > 1:
+                _, ev = self._lru.popitem(last=False)
+                if ev.data is not None:
+                    self.bytes -= len(ev.data)
+        return v
+
+class ProductionHandler(Handler):
+    protocol_version = "HTTP/1.1"
+    cache = FileCache()
+    index = StatIndex()
+
+    def end_headers(self):
+        # niente no-store: qui la cache la decidono ETag e Cache-Control
+        http.server.SimpleHTTPRequestHandler.end_headers(self)
+
+    def log_request(self, code="-", size="-"):
+        # una riga per richiesta sullo stderr costa troppo sotto carico; gli errori restano
+        pass
+
+    def do_GET(self):
+        if not self.send_metrics():
+            self.serve(body=True)
+
+    def do_HEAD(self):
+        self.serve(body=False)
+
+    def resolve(self):
+        """Path su disco della richiesta, oppure None (risposta gia' mandata)."""
+        path = self.translate_path(self.path)
+        if self.index.isdir(path):
+            url = self.path.split("?", 1)[0].split("#", 1)[0]
+            if not url.endswith("/"):
+                self.send_response(301)
+                self.send_header("Location", url + "/")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            path = os.path.join(path, "index.html")
+        return path
+
+    def negotiate(self, path):
+        """(codifica o None, path della variante, stat)."""
+        st = self.index.stat(path)
+        if os.path.splitext(path)[1] in COMPRESSIBLE:
+            accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+            for coding, suffix in ENCODINGS:
+                if coding not in accepted:
+                    continue
+                try:
+                    vst = self.index.stat(path + suffix)
+                except OSError:
+                    continue
+                if vst.st_mtime_ns >= st.st_mtime_ns:
+                    return coding, path + suffix, vst
+        return None, path, st
+
+    def serve(self, body):
+        path = self.resolve()
+        if path is None:
+            return
+        try:
+            coding, vpath, st = self.negotiate(path)
+            if not stat.S_ISREG(st.st_mode):
+                raise OSError
+            v = self.cache.get(vpath, st)
+        except OSError:
+            self.send_error(404, "File not found")
+            return
+
+        headers = [
+            ("ETag", v.etag),
+            ("Cache-Control", IMMUTABLE if HASHED_NAME.search(os.path.basename(path)) else REVALIDATE),
+            ("Last-Modified", formatdate(v.mtime_ns / 1e9, usegmt=True)),
+            ("Accept-Ranges", "bytes"),
+        ]
+        if os.path.splitext(path)[1] in COMPRESSIBLE:
+            headers.append(("Vary", "Accept-Encoding"))
+
+        inm = self.headers.get("If-None-Match")
+        if inm and (inm.strip() == "*" or v.etag in (t.strip() for t in inm.split(","))):
+            self.send_response(304)
+            for k, val in headers:
+                self.send_header(k, val)
+            self.end_headers()
+            return
+
+        start, end, status = 0, v.size - 1, 200
+        rng = self.headers.get("Range")
+        if rng and self.headers.get("If-Range", v.etag) == v.etag:
+            r = parse_range(rng.strip(), v.size)
+            if r is None:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{v.size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if r:
+                start, end = r
+                status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Length", str(end - start + 1))
+        if coding:
+            self.send_header("Content-Encoding", coding)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{v.size}")
+        for k, val in headers:
+            self.send_header(k, val)
+        self.end_headers()
+        if body and v.size:
+            self.send_body(v, start, end)
+
+    def send_body(self, v, start, end):
+        if v.data is not None:
+            self.wfile.write(memoryview(v.data)[start:end + 1])
+            self._sent += end - start + 1
+            return
+        # file grossi (bundle .data/.wasm): zero-copy dal disco al socket
+        with open(v.path, "rb") as f:
+            self._sent += self.connection.sendfile(f, start, end - start + 1)
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--dir", required=True, help="Directory che contiene index.html")
     ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--production", action="store_true",
+                    help="multi-thread, compressione, ETag/cache lunga, Range, cache in memoria")
+    ap.add_argument("--precompress", action="store_true", help="genera le varianti .gz/.br prima di servire")
     args = ap.parse_args()
 
     os.chdir(args.dir)
-    with socketserver.TCPServer(("127.0.0.1", args.port), Handler) as httpd:
+    if args.precompress:
+        n = precompress(".")
+        print(f"{n} varianti compresse scritte" + ("" if brotli else " (brotli non installato: solo gzip)"))
+
+    if args.production:
+        n = ProductionHandler.index.scan(".")
+        print(f"{n} file indicizzati")
+        server = http.server.ThreadingHTTPServer((args.host, args.port), ProductionHandler)
+    else:
+        server = socketserver.TCPServer((args.host, args.port), Handler)
+    with server as httpd:
         print(f"Serving on http://localhost:{args.port}/index.html from {os.getcwd()}")
         httpd.serve_forever()
 
@@ -0,0 +1,393 @@
+import math
+import random
+import time
+from bisect import bisect_left, bisect_right, insort_left
+from collections import namedtuple
+
+from perspective import Perspective
+
+# =============================
+# SIMULAZIONE (headless, senza pygame)
+# =============================
+# Tutta la logica di gioco: stato con seed, step a timestep fisso.
+# Il rendering (main.py) legge lo stato ma non lo modifica.
+
+# spazio logico: la fisica lavora sempre in queste coordinate
+WIDTH, HEIGHT = 900, 600
+VIEW = Perspective(WIDTH, HEIGHT)
+
+SPAWN_MS = 520
+RAMP_CHANCE = 0.25
+
+# Salti
+MANUAL_JUMP_MULT = 2.4   # <-- prima 1.0 (pulsante/spazio). Ora >=2x
+RAMP_JUMP_MULT   = 2.2   # salto su rampa (lasciato simile)
+
+# collisione: solo ostacoli con 0 <= d <= HIT_BAND, entro HIT_DX px dal player
+HIT_BAND = 0.1
+HIT_DX = 75
+DEAD_D = -0.2
+
+# regole di difficolta': i valori sopra sono quelli del gioco; new_state(rules=...)
+# ne cambia alcuni per una sola partita (montecarlo.py le usa per la taratura)
+RULES = {
+    "spawn_ms": SPAWN_MS,
+    "ramp_chance": RAMP_CHANCE,
+    "speed_base": 0.85,     # speed = speed_base + speed_ramp * t
+    "speed_ramp": 0.020,
+    "hit_dx": HIT_DX,
+    "clear_air": 0.16,      # in volo oltre questa quota si passa sopra i SUV
+}
+
+TICK_HZ = 60
+DT = 1.0 / TICK_HZ
+
+# larghezza dello sprite auto (car_player.png * 0.27): serve a _max_lane_x
+PLAYER_W = 414
+
+Inputs = namedtuple("Inputs", "steer jump restart", defaults=(0.0, False, False))
+NO_INPUT = Inputs()
+
+def clamp(x, a, b): return max(a, min(b, x))
+def lerp(a, b, t): return a + (b - a) * t
+
+# =============================
+# ENTITIES
+# =============================
+class Player:
+    def __init__(self, sprite_w=PLAYER_W):
+        self.lane_x = 0.0
+        self.y = VIEW.player_y
+        self.sprite_w = sprite_w
+
+        self.air = 0.0
+        self.v_air = 0.0
+        self.gravity = 2.9
+        self.jump_strength = 1.35
+        self.on_ground = True
+
+        self.steer_vis = 0.0
+
+    def jump(self, m=1.0):
+        if self.on_ground:
+            self.v_air = self.jump_strength * m
+            self.on_ground = False
+
+    def _max_lane_x(self):
+        """
+        Ora la macchina può uscire un po' di più a sx/dx:
+        lasciamo andare oltre la riga bianca di ~0.9 larghezza auto (quasi una macchina),
+        ma senza sparire completamente (almeno un pezzo resta in strada).
+        """
+        half = VIEW.half_w[self.y]
+        sprite_half = self.sprite_w / 2
+
+        # prima era molto più restrittivo; ora permettiamo "quasi una macchina" oltre.
+        extra = sprite_half * 0.90  # <-- quasi larghezza auto
+        margin = 6                 # lascia almeno un filo di contatto
+
+        # "spazio utilizzabile" per il centro della macchina
+        usable = max(10.0, (half + extra) - sprite_half - margin)
+        return clamp(usable / half, 0.15, 1.25)  # può superare 1.0 (oltre bordo strada)
+
+    def update(self, dt, steer):
+        max_lane = self._max_lane_x()
+        self.lane_x = clamp(self.lane_x + steer * 1.75 * dt, -max_lane, max_lane)
+
+        target = clamp(steer, -1.0, 1.0)
+        self.steer_vis = lerp(self.steer_vis, target, clamp(dt * 10.0, 0.0, 1.0))
+
+        if not self.on_ground:
+            self.air += self.v_air * dt * 2.2
+            self.v_air -= self.gravity * dt * 2.2
+            if self.air <= 0.0:
+                self.air = 0.0
+                self.v_air = 0.0
+                self.on_ground = True
+
+    def x(self):
+        return VIEW.lane_to_x(self.lane_x, self.y)
+
+SUV_VARS = (1, 2)
+
+class Thing:
+    __slots__ = ("kind", "d", "lane_x", "var", "lane_v", "wobble_amp", "wobble_f", "wobble_p", "t_alive")
+
+    def __init__(self, kind=None, rng=random):
+        if kind is not None:
+            self.spawn(kind, rng)
+
+    def spawn(self, kind, rng=random):
+        """(Re)inizializza tutti i campi: un Thing riciclato dal pool e' identico a uno nuovo."""
+        self.kind = kind
+        self.d = 1.0 + rng.uniform(0.02, 0.15)
+
+        if kind == "suv":
+            self.lane_x = clamp(rng.gauss(0.0, 0.42), -0.95, 0.95)
+            self.var = rng.choice(SUV_VARS)
+
+            self.lane_v = rng.uniform(-0.08, 0.08)
+            self.wobble_amp = rng.uniform(0.00, 0.06)
+            self.wobble_f   = rng.uniform(0.8, 1.6)
+            self.wobble_p   = rng.uniform(0, math.tau)
+        else:
+            self.lane_x = clamp(rng.gauss(0.0, 0.35), -0.90, 0.90)
+            self.var = 0
+            self.lane_v = 0.0
+            self.wobble_amp = 0.0
+            self.wobble_f = 0.0
+            self.wobble_p = 0.0
+
+        self.t_alive = 0.0
+        return self
+
+    def update(self, dt, speed, rng=random):
+        self.d -= speed * dt
+        self.t_alive += dt
+
+        if self.kind == "suv":
+            if rng.random() < 0.015:
+                self.lane_v += rng.uniform(-0.10, 0.10)
+                self.lane_v = clamp(self.lane_v, -0.20, 0.20)
+
+            self.lane_v += (-self.lane_x) * 0.06 * dt
+            self.lane_x += self.lane_v * dt
+            self.lane_x += math.sin(self.t_alive * self.wobble_f + self.wobble_p) * self.wobble_amp * dt
+            self.lane_x = clamp(self.lane_x, -0.95, 0.95)
+
+    def dead(self):
+        return self.d < DEAD_D
+
+    def pos(self):
+        return VIEW.project(self.d, self.lane_x)
+
+    def hits(self, px, hit_dx=HIT_DX):
+        """Collisione col player, con la sua x gia' calcolata (una volta per tick)."""
+        if not (0.0 <= self.d <= HIT_BAND):
+            return False
+        x, _, _ = self.pos()
+        return abs(px - x) < hit_dx
+
+# =============================
+# THING POOL
+# =============================
+# Capacita' fissa allocata all'avvio: lo spawn ricicla un Thing dal free list e il
+# cull lo restituisce. `allocated` conta i Thing creati a pool vuoto: a regime deve
+# restare fermo (lo mostra il profiler).
+
+THING_POOL = 256
+
+class ThingPool:
+    def __init__(self, capacity=THING_POOL):
+        self.capacity = capacity
+        self.free = [Thing() for _ in range(capacity)]
+        self.allocated = 0
+
+    def take(self, kind, rng):
+        if self.free:
+            th = self.free.pop()
+        else:
+            th = Thing()
+            self.allocated += 1
+        return th.spawn(kind, rng)
+
+    def give(self, th):
+        self.free.append(th)
+
+POOL = ThingPool()
+
+# =============================
+# DEPTH TRACK
+# =============================
+# Ostacoli in due ordini: di spawn (l'update consuma l'rng in quest'ordine, come
+# prima) e per d crescente. A ogni tick tutti scendono della stessa quantita', e la
+# sottrazione in float e' monotona: l'ordine per d non cambia mai, basta inserire
+# con bisect allo spawn. La collisione guarda solo la fetta vicina, il disegno
+# scorre la lista al contrario, i morti sono sempre in testa.
+
+def _depth(th):
+    return th.d
+
+class DepthTrack:
+    def __init__(self, pool=POOL):
+        self.pool = pool
+        self.spawned = []
+        self.by_depth = []
+
+    def __len__(self):
+        return len(self.spawned)
+
+    def __iter__(self):
+        return iter(self.spawned)
+
+    def add(self, th):
+        self.spawned.append(th)
+        # a parita' di d il nuovo va prima: rovesciata, la lista resta in ordine di spawn
+        insort_left(self.by_depth, th, key=_depth)
+
+    def remove(self, th):
+        self.spawned.remove(th)
+        self.by_depth.remove(th)
+        self.pool.give(th)
+
+    def clear(self):
+        for th in self.spawned:
+            self.pool.give(th)
+        self.spawned.clear()
+        self.by_depth.clear()
+
+    def near(self, lo=0.0, hi=HIT_BAND):
+        """Ostacoli con lo <= d <= hi (copia: si puo' rimuovere mentre la si scorre)."""
+        bd = self.by_depth
+        return bd[bisect_left(bd, lo, key=_depth):bisect_right(bd, hi, key=_depth)]
+
+    def cull(self):
+        # in place: di solito muore un ostacolo alla volta, nessuna lista nuova
+        bd = self.by_depth
+        k = bisect_left(bd, DEAD_D, key=_depth)
+        for i in range(k):
+            th = bd[i]
+            self.spawned.remove(th)
+            self.pool.give(th)
+        if k:
+            del bd[:k]
+
+    def far_to_near(self):
+        return reversed(self.by_depth)
+
+# =============================
+# GAME STATE
+# =============================
+def new_state(seed=None, player_w=PLAYER_W, vectorized=False, rules=None):
+    """vectorized=True usa obstacles_np.ObstaclePool (se numpy c'e') al posto della lista;
+    rules: dict con le sole voci di RULES da cambiare."""
+    if seed is None:
+        seed = random.randrange(1 << 32)
+    if vectorized:
+        import obstacles_np
+        vectorized = obstacles_np.AVAILABLE
+    if rules and not rules.keys() <= RULES.keys():
+        raise ValueError(f"regole sconosciute: {sorted(rules.keys() - RULES.keys())}")
+    state = {"seed": seed, "rng": random.Random(seed), "tick": 0, "player_w": player_w, "vectorized": vectorized,
+             "rules": dict(RULES, **(rules or {}))}
+    reset(state)
+    return state
+
+def _new_things(state):
+    things = state.get("things")
+    if things is not None:
+        things.clear()  # restart: stesso contenitore, i Thing tornano nel pool
+        return things
+    if state["vectorized"]:
+        import obstacles_np
+        return obstacles_np.ObstaclePool()
+    return DepthTrack()
+
+def reset(state):
+    state.update({
+        "player": Player(state["player_w"]),
+        "things": _new_things(state),
+        "score": 0.0,
+        "t": 0.0,
+        "last_spawn": 0.0,
+        "over": False,
+        "over_tick": None,
+    })
+    return state
+
+def step(state, dt, inputs):
+    """Avanza la simulazione di dt secondi (chiamare sempre con lo stesso dt)."""
+    state["tick"] += 1
+    player = state["player"]
+    rng = state["rng"]
+    rules = state["rules"]
+
+    if state["over"]:
+        if inputs.restart:
+            reset(state)
+        return state
+
+    if inputs.jump:
+        player.jump(MANUAL_JUMP_MULT)
+
+    state["t"] += dt
+    speed = rules["speed_base"] + rules["speed_ramp"] * state["t"]
+
+    player.update(dt, inputs.steer)
+
+    if (state["t"] - state["last_spawn"]) * 1000.0 > rules["spawn_ms"]:
+        kind = "ramp" if rng.random() < rules["ramp_chance"] else "suv"
+        th = POOL.take(kind, rng)
+        state["things"].add(th)
+        if state["vectorized"]:
+            POOL.give(th)  # il pool numpy ne copia i campi
+        state["last_spawn"] = state["t"]
+
+    if state["vectorized"]:
+        _step_pool(state, dt, speed)
+    else:
+        _step_list(state, dt, speed)
+
+    state["score"] += (speed * 120) * dt
+    return state
+
+def _step_list(state, dt, speed):
+    player = state["player"]
+    things = state["things"]
+    rng = state["rng"]
+    rules = state["rules"]
+
+    for th in things:
+        th.update(dt, speed, rng)
+
+    px = player.x()
+    for th in things.near():
+        if th.hits(px, rules["hit_dx"]):
+            if th.kind == "ramp":
+                player.jump(RAMP_JUMP_MULT)
+                things.remove(th)
+            else:
+                # più permissivo: se stai saltando "abbastanza", passi sopra il SUV
+                if player.air > rules["clear_air"]:
+                    continue
+                state["over"] = True
+                state["over_tick"] = state["tick"]
+
+    things.cull()
+
+def _step_pool(state, dt, speed):
+    pool = state["things"]
+    player = state["player"]
+    rules = state["rules"]
+    pool.update(dt, speed, state["rng"])
+
+    ramp_hit, suv_hit = pool.collide(player, rules["hit_dx"])
+    if ramp_hit:
+        player.jump(RAMP_JUMP_MULT)
+    # più permissivo: se stai saltando "abbastanza", passi sopra il SUV
+    if suv_hit and player.air <= rules["clear_air"]:
+        state["over"] = True
+        state["over_tick"] = state["tick"]
+
+    pool.cull()
+
+def draw_list(state):
+    """Ostacoli da disegnare come (kind, var, d, lane_x), dal piu' lontano al piu' vicino."""
+    if state["vectorized"]:
+        return state["things"].draw_list()
+    return [(th.kind, th.var, th.d, th.lane_x) for th in state["things"].far_to_near()]
+
+def simulate(seed, policy=None, max_ticks=TICK_HZ * 600, dt=DT, vectorized=False, rules=None):
+    """Gioca una partita headless fino al game over; policy(state) -> Inputs."""
+    state = new_state(seed, vectorized=vectorized, rules=rules)
+    while not state["over"] and state["tick"] < max_ticks:
+        step(state, dt, policy(state) if policy else NO_INPUT)
+    return state
+
+if __name__ == "__main__":
+    t0 = time.perf_counter()
+    ticks = 0
+    for seed in range(200):
+        ticks += simulate(seed)["tick"]
+    el = time.perf_counter() - t0
+    print(f"{ticks} ticks in {el:.2f}s -> {ticks / el:.0f} ticks/s")
@@ -0,0 +1,311 @@
+import pygame
+from collections import OrderedDict
+
+# =============================
+# SPRITE LOD CACHE
+# =============================
+# Ogni asset viene pre-scalato su un insieme fisso di livelli lungo la curva
+# prospettica (t = 0 orizzonte, t = 1 vicino). Il draw diventa lookup + blit.
+# Per i draw in batch table() espone i livelli come lista indicizzata per
+# livello, con le meta' misure gia' pronte: niente get_rect per sprite.
+
+def surface_bytes(s):
+    return s.get_width() * s.get_height() * s.get_bytesize()
+
+class SpriteCache:
+    def __init__(self, levels=48, budget_bytes=64 * 1024 * 1024):
+        self.levels = levels
+        self.budget_bytes = budget_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._assets = {}
+        self._lru = OrderedDict()
+        self._tables = {}      # (name, flip) -> [ (img, w // 2, h // 2, w, h) o None ] per livello
+
+    def register(self, name, img, size_at, smooth=True, levels=None):
+        """size_at(t) -> (w, h) per t in [0, 1]. levels=1 per sprite a scala fissa."""
+        self.drop(name)
+        self._assets[name] = (img, size_at, smooth, levels or self.levels)
+
+    def drop(self, name):
+        for key in [k for k in self._lru if k[0] == name]:
+            self.bytes -= surface_bytes(self._lru.pop(key))
+        self._assets.pop(name, None)
+        self._tables.pop((name, False), None)
+        self._tables.pop((name, True), None)
+
+    def level(self, name, t):
+        n = self._assets[name][3]
+        if n <= 1:
+            return 0
+        t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+        return int(t * (n - 1) + 0.5)
+
+    def _build(self, name, lvl, flip):
+        if flip:
+            return pygame.transform.flip(self._get(name, lvl, False), True, False)
+        img, size_at, smooth, n = self._assets[name]
+        w, h = size_at(lvl / (n - 1) if n > 1 else 1.0)
+        if (w, h) == img.get_size():
+            return img
+        if smooth:
+            return pygame.transform.smoothscale(img, (w, h))
+        return pygame.transform.scale(img, (w, h))
+
+    def _get(self, name, lvl, flip):
+        key = (name, lvl, flip)
+        img = self._lru.get(key)
+        if img is not None:
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return img
+
+        self.misses += 1
+        img = self._build(name, lvl, flip)
+        self._lru[key] = img
+        self.bytes += surface_bytes(img)
+        self._evict()
+        return img
+
+    def _evict(self):
+        # tiene sempre almeno l'ultima entry, anche se da sola sfora il budget
+        while self.bytes > self.budget_bytes and len(self._lru) > 1:
+            (name, _, flip), img = self._lru.popitem(last=False)
+            self.bytes -= surface_bytes(img)
+            self.evictions += 1
+            self._tables.pop((name, flip), None)  # non deve tenere in vita lo sprite sfrattato
+
+    def get(self, name, t, flip=False):
+        return self._get(name, self.level(name, t), flip)
+
+    def table(self, name, flip=False):
+        """Livelli di `name` per indice: None dove manca ancora (lo riempie anchor).
+        Si legge con lookup, che tiene aggiornati LRU e contatori come get."""
+        tab = self._tables.get((name, flip))
+        if tab is None:
+            tab = self._tables[(name, flip)] = [None] * self._assets[name][3]
+        return tab
+
+    def anchor(self, name, lvl, flip=False):
+        """Costruisce (o prende dall'LRU) il livello e lo mette nella tabella."""
+        img = self._get(name, lvl, flip)
+        w, h = img.get_size()
+        e = (img, w // 2, h // 2, w, h)
+        self.table(name, flip)[lvl] = e
+        return e
+
+    def lookup(self, tab, name, lvl, flip=False):
+        """Entry di `tab` = table(name, flip) al livello lvl, costruita se manca.
+        Tocca l'LRU: gli sprite usati a ogni frame non sono i primi sfrattati."""
+        e = tab[lvl]
+        if e is not None:
+            key = (name, lvl, flip)
+            if key in self._lru:  # una tabella presa prima di uno sfratto puo' essere vecchia
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return e
+        return self.anchor(name, lvl, flip)
+
+    def preload(self, name, lvl, flip, img):
+        """Mette in cache un livello gia' pronto (es. dall'atlas pre-cotto)."""
+        key = (name, lvl, flip)
+        if key in self._lru:
+            return
+        self._lru[key] = img
+        self.bytes += surface_bytes(img)
+        self._evict()
+
+    def entries(self):
+        for (name, lvl, flip), img in self._lru.items():
+            yield name, lvl, flip, img
+
+    def level_count(self, name):
+        return self._assets[name][3]
+
+    def prebake_iter(self, name, flip=False):
+        """Come prebake, un livello alla volta (per caricare a pezzi tra un frame e l'altro)."""
+        for lvl in range(self._assets[name][3]):
+            self._get(name, lvl, False)
+            if flip:
+                self._get(name, lvl, True)
+            yield lvl
+
+    def prebake(self, name, flip=False):
+        for _ in self.prebake_iter(name, flip):
+            pass
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "bytes": self.bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+# =============================
+# ROTATION FRAMES
+# =============================
+# Inclinazione in sterzata pre-calcolata: un frame ogni `step` gradi in
+# [-max_deg, max_deg], costruiti una volta per immagine sorgente.
+
+class RotationFrames:
+    def __init__(self, max_deg=12.0, step=1.0):
+        self.max_deg = max_deg
+        self.step = step
+        self.n = int(round(max_deg / step))
+        self.source = None
+        self.frames = []
+        self.bytes = 0
+
+    def build_iter(self, img):
+        """Un frame per volta; finche' manca, get() ripiega sull'immagine dritta."""
+        if img is self.source:
+            return
+        self.source = img
+        self.frames = [None] * (2 * self.n + 1)
+        self.frames[self.n] = img
+        self.bytes = 0
+        for i in range(-self.n, self.n + 1):
+            if i:
+                f = pygame.transform.rotate(img, i * self.step)
+                self.frames[i + self.n] = f
+                self.bytes += surface_bytes(f)
+                yield i
+
+    def build(self, img):
+        for _ in self.build_iter(img):
+            pass
+
+    def reset(self, img):
+        """Butta i frame (es. cambio risoluzione): get() da' `img` dritta finche' build_iter non li rifa'."""
+        self.source = None
+        self.frames = [None] * (2 * self.n + 1)
+        self.frames[self.n] = img
+        self.bytes = 0
+
+    def get(self, angle):
+        i = int(round(angle / self.step)) + self.n
+        i = 0 if i < 0 else (2 * self.n if i > 2 * self.n else i)
+        return self.frames[i] or self.frames[self.n]
+
+    def stats(self):
+        return {"frames": sum(f is not None for f in self.frames), "bytes": self.bytes, "step": self.step}
+
+# =============================
+# LIGHT CONE ATLAS
+# =============================
+# Coni cotti una volta sola su una griglia fissa di dimensioni, a intensita'
+# piena. L'intensita' si applica con l'alpha di superficie su una subsurface
+# (stessi pixel, nessuna copia), quindi la memoria dipende solo dalla griglia.
+
+def bake_cone(w, h, intensity=255, layers=46):
+    s = pygame.Surface((w, h), pygame.SRCALPHA)
+    cx = w // 2
+    start_y = int(h * 0.04)
+
+    r0 = max(6, int(w * 0.035))
+    r1 = max(18, int(w * 0.46))
+
+    for i in range(layers):
+        t = i / (layers - 1)
+        grow = t ** 0.70
+        r = int(r0 + (r1 - r0) * grow)
+        y = int(start_y + (h - 1 - start_y) * t)
+
+        a = int(intensity * ((1.0 - t) ** 1.30))
+        if a <= 0:
+            continue
+        pygame.draw.circle(s, (255, 235, 190, a), (cx, y), r)
+    return s
+
+class ConeAtlas:
+    def __init__(self, grid=32, alpha_levels=32, layers=46, budget_bytes=24 * 1024 * 1024):
+        self.grid = grid
+        self.alpha_levels = alpha_levels
+        self.layers = layers
+        self.budget_bytes = budget_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lru = OrderedDict()   # (w, h) -> [base, {alpha_level: view}]
+
+    def cell(self, w, h):
+        g = self.grid
+        return max(g, int(w / g + 0.5) * g), max(g, int(h / g + 0.5) * g)
+
+    def alpha_level(self, intensity):
+        n = self.alpha_levels - 1
+        return int(max(0, min(255, intensity)) * n / 255 + 0.5)
+
+    def get(self, w, h, intensity):
+        key = self.cell(w, h)
+        entry = self._lru.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = [bake_cone(key[0], key[1], 255, self.layers), {}]
+            self._lru[key] = entry
+            self.bytes += surface_bytes(entry[0])
+            self._evict()
+        else:
+            self.hits += 1
+            self._lru.move_to_end(key)
+
+        lvl = self.alpha_level(intensity)
+        view = entry[1].get(lvl)
+        if view is None:
+            base = entry[0]
+            view = base.subsurface(base.get_rect())
+            view.set_alpha(lvl * 255 // (self.alpha_levels - 1))
+            entry[1][lvl] = view
+        return view
+
+    def bytes_for(self, sizes):
+        """Byte delle celle che servono a queste dimensioni (per dimensionare il budget)."""
+        return sum(w * h * 4 for w, h in {self.cell(w, h) for w, h in sizes})
+
+    def _evict(self):
+        while self.bytes > self.budget_bytes and len(self._lru) > 1:
+            _, (base, _) = self._lru.popitem(last=False)
+            self.bytes -= surface_bytes(base)
+            self.evictions += 1
+
+    def clear(self):
+        self._lru.clear()
+        self.bytes = 0
+
+    def preload(self, w, h, base):
+        """Cono gia' cotto a intensita' piena per la cella (w, h) della griglia."""
+        key = self.cell(w, h)
+        if key in self._lru or base.get_size() != key:
+            return
+        self._lru[key] = [base, {}]
+        self.bytes += surface_bytes(base)
+        self._evict()
+
+    def entries(self):
+        for key, (base, _) in self._lru.items():
+            yield key, base
+
+    def prebake(self, sizes):
+        for w, h in sizes:
+            self.get(w, h, 255)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "views": sum(len(v) for _, v in self._lru.values()),
+            "bytes": self.bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
@@ -0,0 +1,68 @@
+from collections import OrderedDict
+
+# =============================
+# TEXT CACHE
+# =============================
+# font.render una volta sola per (font, testo, colore), con LRU.
+# I numeri che cambiano ogni frame (score) si compongono da glifi 0-9 gia'
+# renderizzati, cosi' non finiscono nella cache come stringhe sempre nuove.
+
+DIGITS = "0123456789"
+
+class TextCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lru = OrderedDict()
+        self._digits = {}
+
+    def render(self, fnt, txt, color):
+        key = (fnt, txt, tuple(color))
+        img = self._lru.get(key)
+        if img is not None:
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return img
+
+        self.misses += 1
+        img = fnt.render(txt, True, color)
+        self._lru[key] = img
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+        return img
+
+    def clear(self):
+        """Da chiamare quando si rifanno i font: le chiavi tengono vivi quelli vecchi."""
+        self._lru.clear()
+        self._digits.clear()
+
+    def digits(self, fnt, color):
+        """Glifi 0-9 per (font, colore), tenuti fuori dall'LRU."""
+        key = (fnt, tuple(color))
+        glyphs = self._digits.get(key)
+        if glyphs is None:
+            glyphs = self._digits[key] = [fnt.render(ch, True, color) for ch in DIGITS]
+        return glyphs
+
+    def draw_number(self, surf, value, x, y, color, fnt):
+        """Disegna un intero >= 0 da glifi pre-renderizzati; ritorna la x finale."""
+        glyphs = self.digits(fnt, color)
+        for ch in str(int(value)):
+            g = glyphs[ord(ch) - 48]
+            surf.blit(g, (x, y))
+            x += g.get_width()
+        return x
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }